@@ -0,0 +1,92 @@
+import pygame, math
+from operator import attrgetter
+from sounds import getSound
+
+CHANNEL_BUDGET = 8  # mixer channels reserved for emitters, quietest emitters go unheard if there are more
+VOLUME_THRESHOLD = 0.02  # smallest change in volume of a playing emitter that is sent to the mixer
+SILENT_VOLUME = 0.001  # emitters quieter than this don't get a channel
+getVolume = attrgetter("volume")  # sort key for emitters, made once rather than a new lambda every update
+
+
+class Emitter(object):
+    """A looping sound played from a point in the world."""
+
+    def __init__(self, soundFile, maxDist=None):
+        self.soundFile = soundFile  # name of file in resources/sound, only loaded once emitter is heard
+        self.maxDist = maxDist  # dist from listener at which emitter becomes silent, None if not affected by distance
+        self.xPos = 0
+        self.yPos = 0
+        self.gain = 1.0  # volume when right next to listener, 0 to silence emitter
+        self.channel = None  # mixer channel emitter is playing on, None if not playing
+        self.isHeard = False  # whether emitter was one of loudest as of last AudioEngine update
+        self.volume = 0.0  # overall volume, as of last AudioEngine update
+        self.leftVolume = 0.0  # volume of each speaker last sent to mixer
+        self.rightVolume = 0.0
+        self.nextLeftVolume = 0.0  # volume of each speaker as of last AudioEngine update
+        self.nextRightVolume = 0.0
+
+
+class AudioEngine(object):
+    """Plays many emitters on a fixed pool of mixer channels.
+    Each update, attenuation + panning of all emitters are worked out relative to the listener, the loudest emitters
+    are given channels, and a channel's volume is only changed if it has moved by more than the threshold."""
+
+    def __init__(self, nChannels=CHANNEL_BUDGET, threshold=VOLUME_THRESHOLD):
+        if pygame.mixer.get_num_channels() < nChannels:
+            pygame.mixer.set_num_channels(nChannels)
+        pygame.mixer.set_reserved(nChannels)  # so Sound.play() elsewhere never takes over an emitter's channel
+        self.channels = [pygame.mixer.Channel(i) for i in range(nChannels)]
+        self.freeChannels = list(self.channels)  # channels not given to any emitter
+        self.threshold = threshold
+        self.emitters = []
+
+    def addEmitter(self, emitter):
+        self.emitters.append(emitter)
+
+    def reset(self):
+        """Stop + forget all emitters."""
+        for emitter in self.emitters:
+            if emitter.channel is not None:
+                emitter.channel.stop()
+                self.freeChannels.append(emitter.channel)
+                emitter.channel = None
+        self.emitters = []
+
+    def update(self, xListener, yListener):
+        # work out volume of each emitter in each speaker
+        for emitter in self.emitters:
+            if emitter.maxDist is None:
+                emitter.volume = emitter.gain
+                pan = 0.0
+            else:
+                dx = emitter.xPos - xListener
+                dist = math.sqrt(dx**2 + (emitter.yPos - yListener)**2)
+                emitter.volume = emitter.gain * (1.0 - dist/emitter.maxDist) if dist < emitter.maxDist else 0.0
+                pan = max(-1.0, min(1.0, float(dx)/emitter.maxDist))  # -1 if fully to left, 1 if fully to right
+            emitter.nextLeftVolume = emitter.volume * min(1.0, 1.0 - pan)
+            emitter.nextRightVolume = emitter.volume * min(1.0, 1.0 + pan)
+        # loudest emitters get channels, the rest are stopped. Sorted in place, order barely changes between updates
+        self.emitters.sort(key=getVolume, reverse=True)
+        nHeard = 0
+        for emitter in self.emitters:
+            emitter.isHeard = nHeard < len(self.channels) and emitter.volume > SILENT_VOLUME
+            if emitter.isHeard:
+                nHeard += 1
+            elif emitter.channel is not None:
+                emitter.channel.stop()
+                self.freeChannels.append(emitter.channel)
+                emitter.channel = None
+        for emitter in self.emitters:
+            if not emitter.isHeard: break  # heard emitters are all at start of list
+            if emitter.channel is None:
+                emitter.channel = self.freeChannels.pop()
+                emitter.channel.play(getSound(emitter.soundFile), loops=-1)
+                self.pushVolume(emitter)
+            elif abs(emitter.nextLeftVolume - emitter.leftVolume) > self.threshold \
+                    or abs(emitter.nextRightVolume - emitter.rightVolume) > self.threshold:
+                self.pushVolume(emitter)
+
+    def pushVolume(self, emitter):
+        emitter.leftVolume = emitter.nextLeftVolume
+        emitter.rightVolume = emitter.nextRightVolume
+        emitter.channel.set_volume(emitter.leftVolume, emitter.rightVolume)
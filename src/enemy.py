@@ -1,5 +1,8 @@
-import pygame, random, math, copy, time, os
-from flashlight import Flashlight, getActualAng
+import pygame, random, math, copy, time
+from flashlight import Flashlight
+from audio import Emitter
+from footprints import FootprintTrail
+from telemetry import timedFunction
 
 
 # enemy AI states
@@ -11,23 +14,52 @@ RETURNING = 4   # returning to rail after failing to catch player
 
 
 class Enemy(object):
+    __slots__ = ("xPos", "yPos", "dx", "dy", "speed", "pathSpeed", "closeSpeed", "chaseSpeedFactor", "returnSpeed",
+                 "maxPlayerDistForSound", "staticEmitter", "currentPath", "distDownPath", "currentAI",
+                 "lodRadius", "lodTickInterval", "lodPendingUpdates", "trail")
 
     def __init__(self, xPos, yPos, world):
         self.xPos = xPos
         self.yPos = yPos
         self.dx = self.dy = 0
         self.speed = 4
-        self.sound = pygame.mixer.Sound(os.path.join("resources","sound","enemyNoise.wav"))
-        self.isSoundPlaying = False
+        self.pathSpeed = 5  # speed when following path between intersects
+        self.closeSpeed = 5  # speed when close to player
+        self.chaseSpeedFactor = 1.5  # speed when chasing, relative to player speed
+        self.returnSpeed = 6  # speed when returning to closest intersect
         self.maxPlayerDistForSound = 3*(world.hallWidth + world.hallLength)  # dist where sound plays + enemy follows player
+        self.staticEmitter = Emitter("enemyNoise.wav", self.maxPlayerDistForSound)
         self.currentPath = Path(world)
         gridX = (self.xPos - world.hallWidth) / (world.hallWidth + world.hallLength)
         gridY = (self.yPos - world.hallWidth) / (world.hallWidth + world.hallLength)
         self.currentPath.setPathBetween((gridX, gridY), (gridX, gridY))
         self.distDownPath = 0
         self.currentAI = WANDERING
+        # level-of-detail AI: when far from player, path is followed as progress along hallways at a reduced tick rate
+        self.lodRadius = 2*(world.hallWidth + world.hallLength)  # dist from player beyond which AI runs at low detail
+        self.lodTickInterval = 4  # updates per low detail AI tick
+        self.lodPendingUpdates = 0  # updates passed since last low detail AI tick
+        self.trail = FootprintTrail()  # footprints left behind, seen when flashlight is shone at enemy
 
     def update(self, world, player, flashlight, camPos):
+        if self.lodPendingUpdates > 0 and self.mayChangeAIState(world, player):
+            # catch up on owed movement so AI state is decided from where enemy really is
+            self.lowDetailUpdate(world, player)
+        if self.lodPendingUpdates == 0:
+            # decide AI state once per update, before any movement. Skipped while movement is owed, as it can't change then
+            self.changeAIState(world, player, flashlight, camPos)
+        if self.isLowDetail(world, player):
+            self.lodPendingUpdates += 1
+            # move now if tick is due, or if owed movement reaches next intersect so path advances on the right update
+            if self.lodPendingUpdates >= self.lodTickInterval or \
+                    self.lodPendingUpdates*self.pathSpeed > self.getDistToApproachedPnt(world):
+                self.lowDetailUpdate(world, player)
+            self.trail.record(self.xPos, self.yPos)
+            self.updateSound(player)
+            return
+        elif self.lodPendingUpdates > 0:
+            # catch up on movement owed from low detail updates before resuming full simulation
+            self.lowDetailUpdate(world, player)
         self.dx = 0; self.dy = 0
         self.dx, self.dy = self.getAIDecision(world, player, flashlight, camPos)
         # collision detection
@@ -37,24 +69,18 @@ class Enemy(object):
             self.dx = 0; self.dy = 0
         self.xPos += self.dx
         self.yPos += self.dy
+        self.trail.record(self.xPos, self.yPos)
         # play sound, if closer to player then sound = louder
         self.updateSound(player)
 
     def updateSound(self, player):
-        """Update static noise of enemy to be louder if enemy is closer. Silent if too far away."""
-        distToPlayer = math.sqrt((self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2)
-        volume = 1.0 - (distToPlayer/self.maxPlayerDistForSound)  # will equal 1 (max volume) if distToPlayer = 0, less if distToPlayer > 0
-        if not self.isSoundPlaying:
-            self.sound.play(loops=-1)
-            self.isSoundPlaying=True
-        self.sound.set_volume(0 if distToPlayer > self.maxPlayerDistForSound else volume)
+        """Move static noise of enemy w/ it, audio engine makes it louder if enemy is closer + silent if too far away."""
+        self.staticEmitter.xPos = self.xPos; self.staticEmitter.yPos = self.yPos
+        self.staticEmitter.maxDist = self.maxPlayerDistForSound
 
     def followPathUpdate(self, world):
         """Return (dx, dy) result of update where enemy continues to follow its predecided path."""
-        pathLs = self.currentPath.getPathList()  # sequence of steps to get to destination
-        currentApproachedPnt = pathLs[self.distDownPath+1] # intersect 1 ahead of enemy in its predetermined path, ie. what it is approaching
-        xl, yu, xr, yd = world.getIntersectBoundingBox(currentApproachedPnt) # get region of intersection enemy is approaching
-        approachedCenterPnt = ((xl+xr)/2, (yu+yd)/2)  # actual point enemy is approaching in world
+        approachedCenterPnt = self.getApproachedPnt(world)
         dx, dy = (approachedCenterPnt[0]-self.xPos, approachedCenterPnt[1]-self.yPos)
         if dx == 0 and dy == 0:
             return 0, 0
@@ -66,9 +92,9 @@ class Enemy(object):
         """Check if AI behaviour should now change, alter it appropriately if so."""
         distToPlayer = math.sqrt((self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2)
         if distToPlayer <= world.hallLength:
-            if self.isInFlashlightRegion(flashlight, player, camPos) and self.currentAI != CHASING:
+            if self.isInFlashlightRegion(flashlight, player, camPos):
                 self.currentAI = CHASING
-            elif not self.isInFlashlightRegion(flashlight, player, camPos) and self.currentAI != CLOSE:
+            else:
                 self.currentAI = CLOSE
         elif distToPlayer <= player.getHeardRadius(world):
             if self.currentAI == CLOSE or self.currentAI == CHASING:
@@ -82,39 +108,19 @@ class Enemy(object):
 
     def getAIDecision(self, world, player, flashlight, camPos):
         """Returns a pair of (dx, dy) for next update movement."""
-        # check if AI behaviour should now change based on what is known currently
-        self.changeAIState(world, player, flashlight, camPos)
         # make appropriate movement for current AI state
         if self.currentAI == WANDERING or self.currentAI == FOLLOWING:
             # Is following predetermined paths from intersection to intersection.
-            self.speed = 5
+            self.speed = self.pathSpeed
             # If close enough to player, start following them. Otherwise, keep wandering.
             dx, dy = self.followPathUpdate(world)
             if dx==0 and dy==0:  # has reached destination bc. no further movement needed
-                self.distDownPath += 1
-                if self.distDownPath == self.currentPath.getPathLength()-1: # reset path randomly if completed
-                    pntLs = world.getPntList()
-                    self.distDownPath = 0
-                    gridX = (self.xPos - world.hallWidth) / (world.hallWidth + world.hallLength) # get which intersect enemy is in from its real position
-                    gridY = (self.yPos - world.hallWidth) / (world.hallWidth + world.hallLength)
-                    pnt1 = (gridX, gridY)
-                    pntLs.remove(pnt1)
-                    # if has followed player to where it last heard them + player has left when enemy arrives, set self to WANDERING
-                    # ie. lost track of where player is
-                    distToPlayer = math.sqrt((self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2)
-                    if distToPlayer > player.getHeardRadius(world) and self.currentAI != WANDERING:
-                        self.currentAI = WANDERING
-                    if self.currentAI == WANDERING:
-                        pnt2 = random.choice(pntLs)
-                        self.currentPath.setPathBetween(pnt1, pnt2)
-                    elif self.currentAI == FOLLOWING:
-                        playerCoords = world.getClosestIntersectPoint(player)
-                        self.currentPath.setPathBetween(pnt1, playerCoords)
+                self.advancePath(world, player)
                 dx, dy = self.followPathUpdate(world)  # reset goal point to next one in path
             return dx, dy
         elif self.currentAI == CLOSE or self.currentAI == CHASING:
             # Is moving directly towards player at speed = walking speed if close or > player speed if chasing (flashlight looking at enemy when chasing).
-            self.speed = (player.speed*1.5) if self.currentAI == CHASING else 5
+            self.speed = (player.speed*self.chaseSpeedFactor) if self.currentAI == CHASING else self.closeSpeed
             diffX, diffY = (player.xPos - self.xPos, player.yPos - self.yPos)
             if diffX == 0 and diffY == 0:
                 return 0, 0
@@ -123,7 +129,7 @@ class Enemy(object):
                 return int(math.ceil(dx*self.speed)), int(math.ceil(dy*self.speed))
         elif self.currentAI == RETURNING:
             # Is returning from directly following player to closest intersection, then WANDERING.
-            self.speed = 6
+            self.speed = self.returnSpeed
             closeInt = world.getClosestIntersectPoint(self)
             xl, yu, xr, yd = world.getIntersectBoundingBox(closeInt)
             approachedCenterPnt = ((xl+xr)/2, (yu+yd)/2)
@@ -140,25 +146,92 @@ class Enemy(object):
                 dx, dy = float(dx) / max([abs(dx),abs(dy)]), float(dy) / max([abs(dx), abs(dy)])
                 return int(dx*self.speed), int(dy*self.speed)
 
+    def getApproachedPnt(self, world):
+        """Return centre of intersect 1 ahead of enemy in its predetermined path, ie. what it is approaching."""
+        currentApproachedPnt = self.currentPath.getPathList()[self.distDownPath+1]
+        xl, yu, xr, yd = world.getIntersectBoundingBox(currentApproachedPnt)  # get region of intersection enemy is approaching
+        return ((xl+xr)/2, (yu+yd)/2)
+
+    def advancePath(self, world, player):
+        """Enemy has reached the intersect it was approaching, so move on to next one in path, making new path if completed."""
+        self.distDownPath += 1
+        if self.distDownPath == self.currentPath.getPathLength()-1: # reset path randomly if completed
+            pntLs = world.getPntList()
+            self.distDownPath = 0
+            gridX = (self.xPos - world.hallWidth) / (world.hallWidth + world.hallLength) # get which intersect enemy is in from its real position
+            gridY = (self.yPos - world.hallWidth) / (world.hallWidth + world.hallLength)
+            pnt1 = (gridX, gridY)
+            pntLs.remove(pnt1)
+            # if has followed player to where it last heard them + player has left when enemy arrives, set self to WANDERING
+            # ie. lost track of where player is
+            distToPlayer = math.sqrt((self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2)
+            if distToPlayer > player.getHeardRadius(world) and self.currentAI != WANDERING:
+                self.currentAI = WANDERING
+            if self.currentAI == WANDERING:
+                pnt2 = random.choice(pntLs)
+                self.currentPath.setPathBetween(pnt1, pnt2)
+            elif self.currentAI == FOLLOWING:
+                playerCoords = world.getClosestIntersectPoint(player)
+                self.currentPath.setPathBetween(pnt1, playerCoords)
+
+    def isLowDetail(self, world, player):
+        """Return whether enemy is far enough from player to skip per-pixel movement + collision detection.
+        Only applies while following a path and sitting on the line to the intersect being approached."""
+        if self.currentAI != WANDERING and self.currentAI != FOLLOWING:
+            return False
+        if (self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2 <= self.lodRadius**2:
+            return False
+        xApproached, yApproached = self.getApproachedPnt(world)
+        return self.xPos == xApproached or self.yPos == yApproached
+
+    def getDistToApproachedPnt(self, world):
+        """Dist to intersect being approached, along hallway enemy is in."""
+        xApproached, yApproached = self.getApproachedPnt(world)
+        return abs(xApproached-self.xPos) + abs(yApproached-self.yPos)  # on line to point, so only 1 of these is nonzero
+
+    def mayChangeAIState(self, world, player):
+        """Return whether AI state could change this update anywhere enemy may really be, given its owed movement."""
+        distToPlayer = math.sqrt((self.xPos-player.xPos)**2 + (self.yPos-player.yPos)**2)
+        if self.currentAI == WANDERING:
+            changeDist = max(world.hallLength, player.getHeardRadius(world))  # starts following or gets close
+        else:
+            changeDist = world.hallLength  # gets close
+        return distToPlayer - self.lodPendingUpdates*self.pathSpeed <= changeDist
+
+    def lowDetailUpdate(self, world, player):
+        """Move enemy along its path by the distance it would have covered over all pending updates.
+        Walls are never hit when going between intersect centres, so no collision detection is needed.
+        Pending updates never go past the intersect being approached, so path only advances on the last one."""
+        self.speed = self.pathSpeed
+        distLeft = self.lodPendingUpdates * self.speed  # dist enemy can still travel this tick
+        self.lodPendingUpdates = 0
+        while distLeft > 0:
+            xApproached, yApproached = self.getApproachedPnt(world)
+            distToPnt = self.getDistToApproachedPnt(world)
+            if distToPnt == 0:
+                self.advancePath(world, player)
+                if self.getApproachedPnt(world) == (self.xPos, self.yPos):
+                    break  # new path goes nowhere, so stay here until next tick
+                continue
+            step = min(distLeft, distToPnt)
+            self.xPos += step * cmp(xApproached, self.xPos)
+            self.yPos += step * cmp(yApproached, self.yPos)
+            distLeft -= step
+
     def isInFlashlightRegion(self, flashlight, player, camPos):
-        playerEnemyAng = getActualAng(self.xPos-player.xPos, self.yPos-player.yPos)
-        xMouse, yMouse = pygame.mouse.get_pos()
-        xMouse += camPos[0]; yMouse += camPos[1]
-        mouseAng = getActualAng(xMouse - player.xPos, yMouse - player.yPos)
-        lowerExtreme = mouseAng-(flashlight.angle/2.0)  # angle of lower-angled edge of flashlight's visible region
-        if lowerExtreme<0: lowerExtreme += math.pi*2
-        playerEnemyAng -= lowerExtreme  # rotate world as though flashlight region goes from angles 0 to flashlight.angle
-        if playerEnemyAng<0: playerEnemyAng += math.pi*2
-        return 0 <= playerEnemyAng <= flashlight.angle
+        return flashlight.isInCone(self.xPos, self.yPos, player, flashlight.getConeStart(player, camPos))
 
-    def drawTo(self, screen, flashlight, player, camPos):
-        if self.isInFlashlightRegion(flashlight, player, camPos):
-            pygame.draw.circle(screen, (0,0,0), (self.xPos - camPos[0], self.yPos - camPos[1]), 10, 0)
+    def drawTo(self, footprints, flashlight, player, camPos):
+        """Queue trail of footprints to be drawn if flashlight is shone at enemy."""
+        coneStart = flashlight.getConeStart(player, camPos)
+        if flashlight.isInCone(self.xPos, self.yPos, player, coneStart):
+            footprints.addTrail(self.trail, flashlight, player, camPos, coneStart)
 
 
 
 class Path(object):
     """A path object which can be reset to be a new path between points."""
+    __slots__ = ("worldGrid", "pntLs", "currentPath", "startPnt", "endPnt")
 
     def __init__(self, world):
         self.worldGrid = world.grid
@@ -167,6 +240,7 @@ class Path(object):
         self.startPnt = self.pntLs[0]
         self.endPnt = self.pntLs[0]
 
+    @timedFunction("path.setPathBetween")
     def setPathBetween(self, p1, p2):
         """Do breadth-first search of all intersects, following available paths until destination has been reached.
         Return whether or not path creation was successful."""
@@ -1,50 +1,17 @@
 import pygame, math
 from world import World
 from player import Player
+from telemetry import sessionTelemetry, timedFunction
+from geometry import Ray, SegmentPool
 
-
-def getIntersect(ray, segment):
-
-    # ray in parametric form: r_p + r_d*T1
-    r_px = ray["a"][0]
-    r_py = ray["a"][1]
-    r_dx = ray["b"][0] - ray["a"][0]
-    r_dy = ray["b"][1] - ray["a"][1]
-
-    # segment in parametric form: s_p + s_d*T2
-    s_px = segment["a"][0]
-    s_py = segment["a"][1]
-    s_dx = segment["b"][0] - segment["a"][0]
-    s_dy = segment["b"][1] - segment["a"][1]
-
-    # check if parallel
-    r_mag = math.sqrt(r_dx*r_dx + r_dy*r_dy)
-    s_mag = math.sqrt(s_dx*s_dx + s_dy*s_dy)
-
-    if r_mag == 0 or s_mag == 0: return None
-
-    if r_dx/r_mag == s_dx/s_mag and r_dy/r_mag == s_dy/s_mag: return None
-
-    if r_dx == 0 or r_dy == 0: return None
-
-    # get parameter T2 for segment, 0<=T2<=1 if hits that segment of line
-    T2 = (r_dx*(s_py-r_py) + r_dy*(r_px-s_px))/float(s_dx*r_dy - s_dy*r_dx)
-    if not 0<=T2<=1: return None
-
-    # get parameter T1 for ray, 0<=T1 if ray hits a segment
-    T1 = (s_px+s_dx*T2-r_px)/float(r_dx)
-    if not 0<=T1: return None
-
-    return (r_px + r_dx*T1, r_py + r_dy*T1)  # (x, y)
+SCREEN_MARGIN = 10  # dist outside screen edges that light stops at
+RAY_OFFSETS = (0, 0.1, -0.1)  # x offsets of rays cast around each segment end
 
 
 def getActualAng(x, y):
-    if x>0 and y>0: return math.atan2(y,x)
-    elif x<0 and y>0: return math.atan2(-x, y) + 0.5*math.pi
-    elif x<0 and y<0: return math.atan2(-y, -x) + math.pi
-    elif x>0 and y<0: return 2*math.pi - math.atan2(-y, x)
-    elif x==0: return math.pi*0.5 if y>0 else math.pi*(-0.5)
-    elif y==0: return 0 if x>0 else math.pi
+    """Get angle of (x, y) clockwise from rightwards vector on screen, from 0 to 2*pi."""
+    ang = math.atan2(y, x)
+    return ang + 2*math.pi if ang < 0 else ang
 
 
 class Flashlight(object):
@@ -53,14 +20,47 @@ class Flashlight(object):
         self.angle = angle
         self.xCam = 0; self.yCam = 0
         self.screen = screen
-
+        self.aimPos = None  # screen position flashlight points at, follows mouse if None
+        # reused every frame
+        self.segmentPool = SegmentPool()
+        self.ray = Ray()
+        self.nHits = 0  # number of light intersects found this frame
+        self.xHits = []  # position + angle from player of each light intersect, only first nHits are used
+        self.yHits = []
+        self.hitAngs = []
+        self.polygon = []  # screen positions of light intersects in clockwise order, as [x, y] lists
+        self.polygonStore = []  # every [x, y] list made for polygon
+        self.mask360 = None  # masks subtracted from screen, remade if screen changes size
+        self.maskFlashlight = None
+
+    def getAimPos(self):
+        """Get screen position flashlight is pointing towards."""
+        return pygame.mouse.get_pos() if self.aimPos is None else self.aimPos
+
+    def getConeStart(self, player, camPos):
+        """Get angle of lower-angled edge of flashlight's visible region."""
+        xMouse, yMouse = self.getAimPos()
+        xMouse += camPos[0]; yMouse += camPos[1]
+        mouseAng = getActualAng(xMouse - player.xPos, yMouse - player.yPos)
+        lowerExtreme = mouseAng-(self.angle/2.0)
+        if lowerExtreme<0: lowerExtreme += math.pi*2
+        return lowerExtreme
+
+    def isInCone(self, x, y, player, coneStart):
+        """Return whether point in world is in flashlight's visible region, ignoring walls."""
+        playerPntAng = getActualAng(x-player.xPos, y-player.yPos)
+        playerPntAng -= coneStart  # rotate world as though flashlight region goes from angles 0 to flashlight.angle
+        if playerPntAng<0: playerPntAng += math.pi*2
+        return 0 <= playerPntAng <= self.angle
+
+    @timedFunction("flashlight.drawLight")
     def drawLight(self, world, player, camPos):
         """
         Shadow Drawing Algorithm:
 
-        Get closest hall intersection to self, rest are far away offscreen, so ignore for performance.
-        Get hallways linked to intersection + their bounding boxes + walls of intersect if no hallway there.
-        Use bounding boxes to get intersect lines (longest walls of halls + hall-less walls of intersect).
+        Get hall intersections within world's view radius of closest one to self, ignore the rest for performance.
+        Get walls of their hallways + walls of intersects where there is no hallway from world's segment index,
+        leaving out walls off screen + counting walls shared between intersections once.
         Draw 4 line segments around all 4 edges of screen.
         Cast ray to each line segment end + ray 0.1 to left + ray 0.1 to right.
         Get all intersects of rays + closest line segment, draw polygon by lines between intersects in clockwise manner.
@@ -71,10 +71,10 @@ class Flashlight(object):
         self.xCam, self.yCam = camPos
 
         closestIntersect = world.getClosestIntersectPoint(player)
-        segments = self.getCloseWallSegments(world, closestIntersect[0], closestIntersect[1])
-        lightIntersects = self.getLightSegIntersects(segments, player)
+        segments = self.getVisibleWallSegments(world, closestIntersect)
+        self.getLightSegIntersects(segments, player)
 
-        mask360NoFlashlight = self.get360LightMask(lightIntersects, player)
+        mask360NoFlashlight = self.get360LightMask(player)
         maskFlashlightNoShadows = self.getFlashlightMaskNoShadows(player)
 
         # subtract 360 degree light emission mask and flashlight mask w/o shadows from own screen
@@ -83,100 +83,85 @@ class Flashlight(object):
         self.screen.blit(mask360NoFlashlight, (0,0), special_flags=pygame.BLEND_SUB)
         self.screen.blit(maskFlashlightNoShadows, (0,0), special_flags=pygame.BLEND_SUB)
 
-
-    def getCloseWallSegments(self, world, xIntersectReal, yIntersectReal):
-        intDict = world.grid[yIntersectReal][xIntersectReal]
-        segments = []  # list of all segments that light rays will hit + stop against
-
-        # add box of segments around managed region to catch stray light rays + give them something to hit
-        xl, yu, xr, yd = world.getIntersectBoundingBox((xIntersectReal, yIntersectReal))
-        centerX, centerY = (xr+xl)/2, (yd+yu)/2
-        regionW = regionH = world.hallWidth + 2*world.hallLength
-        segments.extend([{"a": (centerX-regionW/2, centerY-regionH/2), "b": (centerX+regionW/2, centerY-regionH/2)},
-                         {"a": (centerX+regionW/2, centerY-regionH/2), "b": (centerX+regionW/2, centerY+regionH/2)},
-                         {"a": (centerX+regionW/2, centerY+regionH/2), "b": (centerX-regionW/2, centerY+regionH/2)},
-                         {"a": (centerX-regionW/2, centerY+regionH/2), "b": (centerX-regionW/2, centerY-regionH/2)}])
-
-        # get all line segments
-        for p0, isConnected in intDict.items():
-            if isConnected:
-                hallway = (p0, (xIntersectReal, yIntersectReal))
-                xl_h, yu_h, xr_h, yd_h = world.getHallBoundingBox(hallway[0], hallway[1])
-                # get segments now
-                xDiff = hallway[0][0] - hallway[1][0]
-                yDiff = hallway[0][1] - hallway[1][1]
-                if yDiff == 0:  # if vertical hall, walls = left and right sides
-                    segments.append({"a": (xl_h, yu_h), "b": (xr_h, yu_h)})
-                    segments.append({"a": (xl_h, yd_h), "b": (xr_h, yd_h)})
-                elif xDiff == 0:  # if horizontal hall, walls = upper and lower sides
-                    segments.append({"a": (xl_h, yu_h), "b": (xl_h, yd_h)})
-                    segments.append({"a": (xr_h, yu_h), "b": (xr_h, yd_h)})
-            else:
-                # append segment of wall on intersect itself bc. no wall ahead
-                if p0[0] < xIntersectReal: segments.append({"a": (xl, yu), "b": (xl, yd)})     # hall to left missing
-                elif p0[0] > xIntersectReal: segments.append({"a": (xr, yu), "b": (xr, yd)})   # hall to right missing
-                elif p0[1] < yIntersectReal: segments.append({"a": (xl, yu), "b": (xr, yu)})   # hall above missing
-                elif p0[1] > yIntersectReal: segments.append({"a": (xl, yd), "b": (xr, yd)})   # hall below missing
-
-        return segments
-
-
-    def getRayReceivingPoints(self, segments):
-        pnts = []
-
-        # list of points to send light rays to
-        for segment in segments:
-            #xA, yA = segment["a"]; xB, yB = segment["b"]
-            #pygame.draw.line(self.screen, (255, 0, 255), (xA-self.xCam, yA-self.yCam), (xB-self.xCam, yB-self.yCam))
-            #pygame.draw.rect(self.screen, (0, 0, 255), pygame.Rect(xA-self.xCam-5, yA-self.yCam-5, 10, 10))
-            #pygame.draw.rect(self.screen, (0, 0, 255), pygame.Rect(xB-self.xCam-5, yB-self.yCam-5, 10, 10))
-            pnts.extend([segment["a"], segment["b"]])
-
-        return pnts
+    def getMaskSurfaces(self):
+        """Get (360 degree light mask, flashlight mask) surfaces, only making new ones if screen size has changed."""
+        if self.mask360 is None or self.mask360.get_size() != self.screen.get_size():
+            self.mask360 = pygame.Surface(self.screen.get_size())
+            self.maskFlashlight = pygame.Surface(self.screen.get_size())
+            sessionTelemetry.count("flashlight.surfacesAllocated", 2)  # 1 for each mask
+        return self.mask360, self.maskFlashlight
+
+
+    def getVisibleWallSegments(self, world, closestIntersect):
+        """Get walls near enough to closest intersect + on screen, along w/ a box just outside screen edges."""
+        screenW, screenH = self.screen.get_size()
+        # box of segments around screen to catch stray light rays + give them something to hit
+        xl, yu = self.xCam - SCREEN_MARGIN, self.yCam - SCREEN_MARGIN
+        xr, yd = self.xCam + screenW + SCREEN_MARGIN, self.yCam + screenH + SCREEN_MARGIN
+        pool = self.segmentPool
+        pool.clear()
+        pool.add(xl, yu, xr, yu)
+        pool.add(xr, yu, xr, yd)
+        pool.add(xr, yd, xl, yd)
+        pool.add(xl, yd, xl, yu)
+        # walls off screen can't block light from reaching anywhere on screen, so are left out
+        world.addWallSegmentsNear(closestIntersect, (xl, yu, xr, yd), pool)
+        return pool.segments
 
 
     def getLightSegIntersects(self, segments, player):
-        finalInts = []
-        pntLs = self.getRayReceivingPoints(segments)
+        """Cast ray to each segment end + rays 0.1 to either side of it, keeping closest point each one hits."""
+        self.nHits = 0
         xPlayer = player.xPos; yPlayer = player.yPos
-        for p in pntLs:
-            rays = [{"a": (xPlayer, yPlayer), "b": p},
-                    {"a": (xPlayer, yPlayer), "b": (p[0]+0.1, p[1])},
-                    {"a": (xPlayer, yPlayer), "b": (p[0]-0.1, p[1])}]
-            for ray in rays:
-                intersects = []
-                for seg in segments:
-                    intersect = getIntersect(ray, seg)
-                    if intersect == None: continue
-                    intersects.append(intersect)
-                if len(intersects) == 0: continue
-                minIntersect = min(intersects, key=lambda i: math.sqrt((i[0]-xPlayer)**2 + (i[1]-yPlayer)**2))
-                finalInts.append(minIntersect)
-
-        #for intersect in finalInts:
-        #    screenW, screenH = self.screen.get_size()
-        #    pygame.draw.line(self.screen, (255, 0, 255), (screenW/2, screenH/2), (intersect[0]-self.xCam, intersect[1]-self.yCam))
-        #    pygame.draw.rect(self.screen, (255, 0, 255), pygame.Rect(intersect[0]-self.xCam-5, intersect[1]-self.yCam-5, 10, 10))
-
-        return finalInts
-
-
-    def get360LightMask(self, lightIntLs, player):
+        for segment in segments:
+            #pygame.draw.line(self.screen, (255, 0, 255), (segment.xA-self.xCam, segment.yA-self.yCam), (segment.xB-self.xCam, segment.yB-self.yCam))
+            self.castRaysTo(segment.xA, segment.yA, segments, xPlayer, yPlayer)
+            self.castRaysTo(segment.xB, segment.yB, segments, xPlayer, yPlayer)
+
+    def castRaysTo(self, x, y, segments, xPlayer, yPlayer):
+        ray = self.ray
+        for xOffset in RAY_OFFSETS:
+            ray.aim(xPlayer, yPlayer, x + xOffset, y)
+            if ray.cast(segments):
+                self.addHit(ray.xHit, ray.yHit)
+
+    def addHit(self, x, y):
+        if self.nHits == len(self.xHits):
+            self.xHits.append(x); self.yHits.append(y); self.hitAngs.append(0)
+        else:
+            self.xHits[self.nHits] = x; self.yHits[self.nHits] = y
+        self.nHits += 1
+
+
+    def get360LightMask(self, player):
         xPlayer = player.xPos; yPlayer = player.yPos
+        xHits = self.xHits; yHits = self.yHits; hitAngs = self.hitAngs
         # sort out angles
-        sortedInts = sorted(lightIntLs, key = lambda p: getActualAng(p[0]-xPlayer, p[1]-yPlayer))
+        for i in range(self.nHits):
+            hitAngs[i] = getActualAng(xHits[i]-xPlayer, yHits[i]-yPlayer)
+        order = range(self.nHits)
+        order.sort(key=hitAngs.__getitem__)
+        polygon = self.polygon
+        del polygon[:]
+        for i in order:
+            if len(polygon) == len(self.polygonStore):
+                self.polygonStore.append([0, 0])
+            pnt = self.polygonStore[len(polygon)]
+            pnt[0] = xHits[i]-self.xCam; pnt[1] = yHits[i]-self.yCam
+            polygon.append(pnt)
 
         # temporary surface = white w/ black polygon of visible regions
-        tempSurface = pygame.Surface(self.screen.get_size())
-        pygame.draw.rect(tempSurface, (255 , 255, 255), pygame.Rect(0, 0, tempSurface.get_size()[0], tempSurface.get_size()[1]))
-        pygame.draw.polygon(tempSurface, (0, 0, 0), [(x-self.xCam, y-self.yCam) for x,y in sortedInts])
+        tempSurface = self.getMaskSurfaces()[0]
+        tempSurface.fill((255, 255, 255))
+        if len(polygon) > 2:
+            pygame.draw.polygon(tempSurface, (0, 0, 0), polygon)
 
         return tempSurface
 
 
     def getFlashlightMaskNoShadows(self, player):
         # get region of flashlight-produced light triangle
-        xMouse, yMouse = pygame.mouse.get_pos()
+        xMouse, yMouse = self.getAimPos()
         xMouse += self.xCam; yMouse += self.yCam
         mouseAng = getActualAng(xMouse - player.xPos, yMouse - player.yPos)
         screenWidth, screenHeight = self.screen.get_size()
@@ -184,8 +169,8 @@ class Flashlight(object):
         mousePnt2 = (player.xPos + 2*screenWidth*math.cos(mouseAng+self.angle/2.0), player.yPos + 2*screenHeight*math.sin(mouseAng+self.angle/2.0))
 
         # triangle surface = grey w/ black triangle of what flashlight reveals
-        triangSurface = pygame.Surface(self.screen.get_size())
-        pygame.draw.rect(triangSurface, (110 , 110, 110), pygame.Rect(0, 0, triangSurface.get_size()[0], triangSurface.get_size()[1]))
+        triangSurface = self.getMaskSurfaces()[1]
+        triangSurface.fill((110, 110, 110))
         triangLs = [(player.xPos, player.yPos), mousePnt1, mousePnt2]
         pygame.draw.polygon(triangSurface, (0, 0, 0), [(x-self.xCam, y-self.yCam) for x,y in triangLs])
 
@@ -0,0 +1,102 @@
+import pygame, math, itertools
+
+TRAIL_LENGTH = 24  # footprints remembered per trail
+FOOTPRINT_SPACING = 45  # dist travelled between footprints
+FOOT_OFFSET = 6  # dist of each footprint to side of path travelled
+N_DIRECTIONS = 16  # rotations of footprint sprite drawn in advance
+FOOTPRINT_COLOR = (0, 0, 0)
+
+footprintSprites = None  # direction index -> footprint sprite facing that way, made when first drawn
+
+
+def getFootprintSprites():
+    """Get footprint sprite rotated to each of N_DIRECTIONS, drawing them the first time they are needed."""
+    global footprintSprites
+    if footprintSprites is None:
+        sprite = pygame.Surface((18, 10), pygame.SRCALPHA, 32)  # footprint pointing rightwards
+        pygame.draw.ellipse(sprite, FOOTPRINT_COLOR, pygame.Rect(0, 1, 12, 8))  # sole
+        pygame.draw.ellipse(sprite, FOOTPRINT_COLOR, pygame.Rect(12, 2, 6, 6))  # toes
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        # screen y axis points down, so clockwise angles from rotate() need negating
+        footprintSprites = [pygame.transform.rotate(sprite, -math.degrees(2*math.pi*i/N_DIRECTIONS))
+                            for i in range(N_DIRECTIONS)]
+    return footprintSprites
+
+
+class FootprintTrail(object):
+    """Where something has stepped recently, kept in a fixed-size ring buffer so recording never allocates."""
+
+    def __init__(self, length=TRAIL_LENGTH, spacing=FOOTPRINT_SPACING):
+        self.length = length
+        self.spacing = spacing
+        self.xs = [0]*length  # centre of each footprint
+        self.ys = [0]*length
+        self.directions = [0]*length  # index into footprint sprites of each footprint
+        self.head = 0  # index next footprint is written to, oldest footprint if buffer is full
+        self.count = 0  # footprints in buffer
+        self.xLast = None  # position when last recorded
+        self.yLast = None
+        self.distSinceStep = 0.0  # dist travelled since last footprint
+        self.isLeftFoot = False  # which foot next footprint is made by
+
+    def record(self, x, y):
+        """Add footprint at position if far enough from last one."""
+        if self.xLast is None:
+            self.xLast = x; self.yLast = y
+            return
+        dx = x - self.xLast; dy = y - self.yLast
+        if dx == 0 and dy == 0:
+            return
+        self.xLast = x; self.yLast = y
+        dist = math.sqrt(dx*dx + dy*dy)
+        self.distSinceStep += dist
+        if self.distSinceStep < self.spacing:
+            return
+        self.distSinceStep = 0.0
+        # place footprint to side of path, alternating feet
+        side = FOOT_OFFSET if self.isLeftFoot else -FOOT_OFFSET
+        self.xs[self.head] = int(x + side*dy/dist)
+        self.ys[self.head] = int(y - side*dx/dist)
+        self.directions[self.head] = int(round(math.atan2(dy, dx) * N_DIRECTIONS / (2*math.pi))) % N_DIRECTIONS
+        self.isLeftFoot = not self.isLeftFoot
+        self.head = (self.head + 1) % self.length
+        if self.count < self.length:
+            self.count += 1
+
+
+class FootprintRenderer(object):
+    """Gathers footprints of any number of trails each frame, then draws them all w/ one batched blit.
+    Only footprints on screen + in flashlight cone are drawn. Blit entries are reused between frames."""
+
+    def __init__(self, maxFootprints=256):
+        self.blitEntries = [[None, pygame.Rect(0, 0, 0, 0)] for i in range(maxFootprints)]  # [sprite, dest rect]
+        self.nEntries = 0  # entries to draw this frame
+
+    def addTrail(self, trail, flashlight, player, camPos, coneStart):
+        """Queue footprints of trail to be drawn, coneStart = flashlight.getConeStart(player, camPos)."""
+        sprites = getFootprintSprites()
+        screenW, screenH = flashlight.screen.get_size()
+        xCam, yCam = camPos
+        for n in range(trail.count):
+            if self.nEntries == len(self.blitEntries):
+                return
+            i = (trail.head - 1 - n) % trail.length  # newest footprints first
+            x = trail.xs[i] - xCam; y = trail.ys[i] - yCam
+            if not (0 <= x < screenW and 0 <= y < screenH) or not flashlight.isInCone(trail.xs[i], trail.ys[i], player, coneStart):
+                continue
+            entry = self.blitEntries[self.nEntries]
+            sprite = sprites[trail.directions[i]]
+            entry[0] = sprite
+            entry[1].x = x - sprite.get_width()/2
+            entry[1].y = y - sprite.get_height()/2
+            self.nEntries += 1
+
+    def drawTo(self, screen):
+        """Draw all queued footprints + clear queue for next frame."""
+        if hasattr(screen, "blits"):
+            screen.blits(itertools.islice(self.blitEntries, self.nEntries), False)
+        else:  # pygame before 1.9.4
+            for sprite, rect in itertools.islice(self.blitEntries, self.nEntries):
+                screen.blit(sprite, rect)
+        self.nEntries = 0
@@ -1,8 +1,14 @@
-import pygame, math, time, random, copy
+import pygame, math, time, random, copy, os, gc
 from world import World
 from player import Player
 from enemy import Enemy
 from flashlight import Flashlight
+from replay import InputRecorder
+from idle import waitForInput
+from transition import Transition
+from telemetry import sessionTelemetry
+from audio import AudioEngine
+from footprints import FootprintRenderer
 
 
 class GameSession(object):
@@ -13,9 +19,19 @@ class GameSession(object):
         w, h = self.screen.get_size()
         pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0,0,w,h))
         self.world = World(10, 10, self.screen)
+        self.recordDir = None  # if set, input of each game is recorded to a new file in this directory
+        self.recorder = None  # InputRecorder of game currently being recorded
+        self.replayer = None  # if set, InputReplayer giving input instead of keyboard + mouse
+        self.renderEnabled = True  # if False, game is only updated, never drawn
+        self.pauseGC = False  # if True, cyclic garbage collector is paused during each level + run between levels
+        self.messageRandom = random.Random()  # separate from gameplay randomness so drawing doesn't affect replays
+        self.transition = Transition()  # fade into each level
+        self.audio = AudioEngine()
+        self.footprints = FootprintRenderer()
 
     def newGame(self):
         pygame.mixer.stop()
+        self.audio.reset()
         self.world.resetWorld()
         self.world.genWorld(5, 5)
         self.player = Player(*self.world.getStartPoint())
@@ -28,6 +44,9 @@ class GameSession(object):
         xl, yu, xr, yd = self.world.getIntersectBoundingBox(pnt)
         px, py = ((xl+xr)/2, (yu+yd)/2)
         self.enemy = Enemy(px, py, self.world)
+        for emitter in self.player.footstepEmitters.values():
+            self.audio.addEmitter(emitter)
+        self.audio.addEmitter(self.enemy.staticEmitter)
         self.flashlight = Flashlight(self.screen, 1)  # flashlight w/ range of 1 radian
         self.keys = None
         self.xCam = 0
@@ -38,50 +57,101 @@ class GameSession(object):
 
     def startGame(self):
         """Start session of playing game."""
+        seed = self.replayer.seed if self.replayer is not None else random.randrange(2**32)
+        random.seed(seed)
+        if self.recordDir is not None:
+            path = os.path.join(self.recordDir, time.strftime("%Y%m%d-%H%M%S") + "-%d.rec" % seed)  # seed so names are unique
+            self.recorder = InputRecorder(path, seed, self.screen.get_size())
         beatLevel = True
         currentLevel = 0
-        while beatLevel:
-            beatLevel = self.startLevel()
-            if beatLevel: currentLevel += 1
+        try:
+            while beatLevel:
+                sessionTelemetry.count("game.levelsStarted")
+                sessionTelemetry.setGauge("game.currentLevel", currentLevel)
+                if self.pauseGC:
+                    # collect garbage of last level now instead of at random points during play
+                    collectStartTime = time.time()
+                    gc.collect()
+                    sessionTelemetry.observe("gc.levelCollectTime", time.time() - collectStartTime)
+                    sessionTelemetry.pauseGC()  # also stops collections telemetry runs itself
+                try:
+                    beatLevel = self.startLevel()
+                finally:
+                    if self.pauseGC: sessionTelemetry.resumeGC()
+                if beatLevel: currentLevel += 1
+        finally:
+            # close even if game was stopped by an error, so recorded inputs so far are kept
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
         return currentLevel
 
     def startLevel(self):
         """Start play of a level. Returns True if player got to end, False if killed by enemy or player quit."""
+        # make transition effect to new level, faded out while level is played
+        if self.renderEnabled:
+            self.transition.start(self.screen)
         self.newGame()
-        # make transition effect to new level
-        prevScreen = pygame.Surface(self.screen.get_size())
-        prevScreen.blit(self.screen, (0,0))
-        self.keys = pygame.key.get_pressed()
+        self.pollInput()
         self.update()
-        self.render()
-        self.renderTransition(prevScreen, self.screen)
+        if self.renderEnabled:
+            self.render()
+            self.transition.drawTo(self.screen)
+            pygame.display.flip()
         wasESCPressed = False  # was ESC pressed last turn
         paused = False
+        isPauseShown = False  # has pause screen been drawn since game was paused
         while not self.keys[pygame.K_q]:
-            self.keys = pygame.key.get_pressed()
+            frameStartTime = time.time()
+            self.pollInput()
             if not self.keys[pygame.K_ESCAPE] and wasESCPressed:  # invert whether paused or not if escape pressed + released
                 paused = not paused
+                isPauseShown = False
                 if paused: pygame.mixer.pause()
                 else:      pygame.mixer.unpause()
-            if paused:
-                self.renderPause()
+            wasESCPressed = self.keys[pygame.K_ESCAPE]
+            if paused and isPauseShown:
+                # nothing changes while paused, so sleep until there is input instead of redrawing
+                if self.replayer is None: waitForInput()
+                continue
+            elif paused:
+                if self.renderEnabled: self.renderPause()
+                isPauseShown = True
             else:
                 self.update()
-                self.render()
-            wasESCPressed = self.keys[pygame.K_ESCAPE]
-            if (-10 < self.enemy.xPos-self.player.xPos < 10) and (-10 < self.enemy.yPos-self.player.yPos < 10):
+                if self.renderEnabled:
+                    self.render()
+                    self.transition.drawTo(self.screen)
+            if self.hasBeenCaught():
                 # enemy got to player, player = killed
                 return False
             elif self.world.hasReachedExit(self.player):
                 # player reached exit
                 return True
-            pygame.display.flip()
-            pygame.event.pump()
+            if self.renderEnabled:
+                pygame.display.flip()
+                pygame.event.pump()
+            sessionTelemetry.observe("game.frameTime", time.time() - frameStartTime)
         return False  # player hit 'q' to quit game
 
+    def pollInput(self):
+        """Get keys pressed + flashlight aim for next update, from replay if there is one, and record them if recording."""
+        if self.replayer is not None:
+            self.keys, self.flashlight.aimPos = self.replayer.nextInput()
+        else:
+            self.keys = pygame.key.get_pressed()
+            self.flashlight.aimPos = pygame.mouse.get_pos()
+        if self.recorder is not None:
+            self.recorder.recordInput(self.keys, self.flashlight.aimPos)
+
+    def hasBeenCaught(self):
+        """Return whether enemy has got to player."""
+        return (-10 < self.enemy.xPos-self.player.xPos < 10) and (-10 < self.enemy.yPos-self.player.yPos < 10)
+
     def update(self):
         self.player.update(self.keys, self.world)
         self.enemy.update(self.world, self.player, self.flashlight, (self.xCam, self.yCam))
+        self.audio.update(self.player.xPos, self.player.yPos)
         x, y = self.screen.get_size()
         self.xCam = self.player.xPos - x/2
         self.yCam = self.player.yPos - y/2
@@ -89,12 +159,13 @@ class GameSession(object):
     def render(self):
         self.world.drawWorld(self.xCam, self.yCam, self.player)
         self.player.drawTo(self.screen)
-        self.enemy.drawTo(self.screen, self.flashlight, self.player, (self.xCam, self.yCam))
+        self.enemy.drawTo(self.footprints, self.flashlight, self.player, (self.xCam, self.yCam))
+        self.footprints.drawTo(self.screen)
         self.flashlight.drawLight(self.world, self.player, (self.xCam, self.yCam))
         # draw random message from enemy
-        if time.clock() - self.startTime >= random.choice(range(90, 120)) \
-                and random.random() < 0.1 and self.currentMessage==None:
-            self.currentMessage = random.choice(self.messages)
+        if time.clock() - self.startTime >= self.messageRandom.choice(range(90, 120)) \
+                and self.messageRandom.random() < 0.1 and self.currentMessage==None:
+            self.currentMessage = self.messageRandom.choice(self.messages)
             self.startTime = time.clock()
         if self.currentMessage != None:
             textFont = pygame.font.SysFont("comicsans", 50)
@@ -104,36 +175,11 @@ class GameSession(object):
                 self.currentMessage = None
                 self.startTime = time.clock()
 
-    def updateFake(self):
-        """Use a false game session for display on menu; fake session update detailed here."""
-        x, y = self.screen.get_size()
-        self.xCam = self.player.xPos - x/2
-        self.yCam = self.player.yPos - y/2
-
-    def renderFake(self):
-        """Use a false game session for display on menu; fake session rendering detailed here."""
-        x, y = self.screen.get_size()
-        self.world.drawWorld(self.xCam, self.yCam, self.player)
-        self.player.drawTo(self.screen)
-        self.flashlight.drawLight(self.world, self.player, (self.xCam, self.yCam))
-
     def renderPause(self):
         font = pygame.font.SysFont("comicsans", 50)
         text = font.render("Paused", 1, (255, 255, 255))
         self.screen.blit(text, (0, 0))
 
-    def renderTransition(self, frame1, frame2):
-        """fade from one image to another."""
-        frame1 = frame1.convert(); frame2 = frame2.convert()
-        w, h = self.screen.get_size()
-        for alpha2 in range(255):
-            alpha1 = 255-alpha2
-            frame1.set_alpha(alpha1); frame2.set_alpha(alpha2)
-            pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0, 0, w, h))
-            self.screen.blit(frame1, (0,0))
-            self.screen.blit(frame2, (0,0))
-            pygame.display.flip()
-
 
 def main():
     pygame.init()
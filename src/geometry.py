@@ -0,0 +1,83 @@
+"""
+Compact geometry types used every frame by lighting + collision detection.
+Attributes are kept in __slots__, and objects are made once + reused from frame to frame rather than remade.
+"""
+
+
+class Segment(object):
+    """Line segment from (xA, yA) to (xB, yB)."""
+    __slots__ = ("xA", "yA", "xB", "yB", "dx", "dy")
+
+    def __init__(self, xA=0, yA=0, xB=0, yB=0):
+        self.set(xA, yA, xB, yB)
+
+    def set(self, xA, yA, xB, yB):
+        self.xA = xA; self.yA = yA
+        self.xB = xB; self.yB = yB
+        self.dx = xB - xA; self.dy = yB - yA
+
+
+class Box(object):
+    """Axis-aligned rectangle, edges included."""
+    __slots__ = ("xMin", "yMin", "xMax", "yMax", "xCentre", "yCentre")
+
+    def __init__(self, xMin, yMin, xMax, yMax):
+        self.xMin = xMin; self.yMin = yMin
+        self.xMax = xMax; self.yMax = yMax
+        self.xCentre = (xMin + xMax)/2.0
+        self.yCentre = (yMin + yMax)/2.0
+
+
+class Ray(object):
+    """Half-line starting at an origin + going through a target point. Closest point hit by last cast is kept."""
+    __slots__ = ("xOrigin", "yOrigin", "dx", "dy", "xHit", "yHit")
+
+    def __init__(self):
+        self.aim(0, 0, 0, 0)
+        self.xHit = self.yHit = 0
+
+    def aim(self, xOrigin, yOrigin, xTarget, yTarget):
+        self.xOrigin = xOrigin; self.yOrigin = yOrigin
+        self.dx = xTarget - xOrigin; self.dy = yTarget - yOrigin
+
+    def cast(self, segments):
+        """Find closest point where ray hits any of segments, putting it in (xHit, yHit). Return whether any were hit.
+        Rays parallel to an axis hit nothing."""
+        r_px = self.xOrigin; r_py = self.yOrigin
+        r_dx = self.dx; r_dy = self.dy
+        if r_dx == 0 or r_dy == 0: return False
+        closestT1 = None
+        for seg in segments:
+            denom = seg.dx*r_dy - seg.dy*r_dx
+            if denom == 0: continue  # parallel, or segment has no length
+            # get parameter T2 for segment, 0<=T2<=1 if hits that segment of line
+            T2 = (r_dx*(seg.yA-r_py) + r_dy*(r_px-seg.xA))/float(denom)
+            if not 0<=T2<=1: continue
+            # get parameter T1 for ray, 0<=T1 if ray hits a segment, smaller T1 = closer to origin
+            T1 = (seg.xA+seg.dx*T2-r_px)/float(r_dx)
+            if 0<=T1 and (closestT1 is None or T1 < closestT1):
+                closestT1 = T1
+        if closestT1 is None: return False
+        self.xHit = r_px + r_dx*closestT1
+        self.yHit = r_py + r_dy*closestT1
+        return True
+
+
+class SegmentPool(object):
+    """Segments in use this frame, made from Segment objects left over from earlier frames where possible."""
+
+    def __init__(self):
+        self.segments = []  # segments in use
+        self.store = []  # every Segment made by pool
+
+    def clear(self):
+        del self.segments[:]
+
+    def add(self, xA, yA, xB, yB):
+        n = len(self.segments)
+        if n == len(self.store):
+            self.store.append(Segment())
+        segment = self.store[n]
+        segment.set(xA, yA, xB, yB)
+        self.segments.append(segment)
+        return segment
@@ -0,0 +1,15 @@
+import pygame
+from telemetry import sessionTelemetry
+
+IDLE_TIMEOUT = 0.5  # longest time to sleep for while waiting for input, in secs
+WAKE_EVENT = pygame.USEREVENT + 1  # posted by timer to stop waiting for input
+
+
+def waitForInput(timeout=IDLE_TIMEOUT):
+    """Sleep until an input event arrives or timeout (secs) passes, instead of spinning the CPU.
+    Key + mouse state seen by pygame.key.get_pressed() etc. are updated as usual."""
+    pygame.time.set_timer(WAKE_EVENT, max(1, int(timeout*1000)))
+    pygame.event.wait()
+    pygame.time.set_timer(WAKE_EVENT, 0)
+    pygame.event.clear(WAKE_EVENT)
+    sessionTelemetry.update()  # nothing is observed while idle, so keep telemetry being written from here
@@ -0,0 +1,14 @@
+class KeyState(object):
+    """Stand-in for result of pygame.key.get_pressed(), for input that doesn't come from the keyboard."""
+
+    def __init__(self, pressedKeys=()):
+        self.pressedKeys = frozenset(pressedKeys)
+
+    def __getitem__(self, key):
+        return key in self.pressedKeys
+
+    def __eq__(self, other):
+        return isinstance(other, KeyState) and self.pressedKeys == other.pressedKeys
+
+    def __ne__(self, other):
+        return not self == other
@@ -1,14 +1,36 @@
-import pygame
+import time
+launchTime = time.time()  # before other imports, so their loading time counts towards time to first frame
+import pygame, os, argparse
 from menusession import MenuSession
+from telemetry import sessionTelemetry
 
 def main():
+    parser = argparse.ArgumentParser(description="iseeyou, a top-down survival horror game.")
+    parser.add_argument("--record", metavar="DIR", help="record input of each game played to a file in DIR, for use w/ replay.py")
+    parser.add_argument("--telemetry", metavar="FILE", help="periodically append frame time, memory + GC stats to FILE as JSON lines")
+    parser.add_argument("--telemetry-interval", type=float, default=60.0, metavar="SECS", help="time between telemetry writes")
+    parser.add_argument("--telemetry-max-bytes", type=int, default=10*1024*1024,
+                        help="size telemetry file can reach before being rotated to FILE.1")
+    parser.add_argument("--view-radius", type=int, default=0, metavar="N",
+                        help="draw + light intersects up to N away from closest one, for large windows")
+    parser.add_argument("--pause-gc", action="store_true",
+                        help="pause cyclic garbage collector during each level, collecting between levels instead")
+    args = parser.parse_args()
+    if args.telemetry is not None:
+        sessionTelemetry.enable(args.telemetry, args.telemetry_interval, args.telemetry_max_bytes)
+    if args.record is not None and not os.path.isdir(args.record):
+        os.makedirs(args.record)
     pygame.init()
     pygame.mixer.init()
     screen = pygame.display.set_mode((800, 800))
     pygame.display.set_caption("iseeyou")
-    session = MenuSession(screen)
-    session.start()
-    pygame.mixer.quit()
+    session = MenuSession(screen, args.record, launchTime, args.view_radius, args.pause_gc)
+    try:
+        session.start()
+    finally:
+        # write last telemetry + turn automatic GC back on even if game stopped on an error
+        sessionTelemetry.close()
+        pygame.mixer.quit()
 
 if __name__ == "__main__":
     main()
@@ -1,36 +1,122 @@
-import pygame
-from gamesession import GameSession
+import pygame, time
+from idle import waitForInput, IDLE_TIMEOUT
+from transition import Transition
+from telemetry import sessionTelemetry
+from world import World
+from player import Player
+from flashlight import Flashlight
 
 PLAY = 0
 CONTROLS = 1
 QUIT = 2
 NO_SELECTION = 3
 
+GAME_OVER_DURATION = 3.0  # secs game over screen is shown for
+
+
+class MenuBackdrop(object):
+    """Fake game session displayed behind menu: a world w/ a player whose flashlight follows the mouse.
+    Only built once the first frame of the menu has been shown, so menu appears as soon as possible."""
+
+    def __init__(self, screen, viewRadius=0):
+        self.screen = screen
+        self.viewRadius = viewRadius
+        self.world = None
+        self.player = None
+        self.flashlight = None
+        self.xCam = 0
+        self.yCam = 0
+
+    def isBuilt(self):
+        return self.world is not None
+
+    def build(self):
+        self.world = World(10, 10, self.screen)
+        self.world.viewRadius = self.viewRadius
+        self.world.genWorld(5, 5)
+        self.player = Player(*self.world.getStartPoint())
+        self.flashlight = Flashlight(self.screen, 1)
+
+    def update(self):
+        if not self.isBuilt():
+            return
+        x, y = self.screen.get_size()
+        self.xCam = self.player.xPos - x/2
+        self.yCam = self.player.yPos - y/2
+
+    def render(self):
+        if not self.isBuilt():
+            w, h = self.screen.get_size()
+            pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0,0,w,h))
+            return
+        self.world.drawWorld(self.xCam, self.yCam, self.player)
+        self.player.drawTo(self.screen)
+        self.flashlight.drawLight(self.world, self.player, (self.xCam, self.yCam))
+
 
 class MenuSession(object):
 
-    def __init__(self, screen):
+    def __init__(self, screen, recordDir=None, launchTime=None, viewRadius=0, pauseGC=False):
         self.screen = screen
-        self.fakeSession = GameSession(self.screen)
-        self.fakeSession.newGame()
-        self.gameSession = GameSession(self.screen)
+        self.backdrop = MenuBackdrop(self.screen, viewRadius)
+        self.viewRadius = viewRadius  # how many intersects around player are drawn + lit
+        self.gameSession = None  # made when first needed, so gameplay modules + assets aren't loaded until Play chosen
+        self.recordDir = recordDir
+        self.pauseGC = pauseGC  # pause garbage collector during each level of game
+        self.launchTime = time.time() if launchTime is None else launchTime  # time program was started
+        self.timeToFirstFrame = None  # secs from launch until first menu frame shown
         self.keys = None
         self.selectedOption = PLAY
         self.selectionBoxes = None
         self.isControlsMenu = False  # if False, on main menu, else on controls menu
         self.hasQuitted = False
         self.wasLeftClkDown = False
+        self.drawnState = None  # mouse + menu state when menu was last drawn, None if redraw needed
+        self.gameOverEndTime = None  # time to stop showing game over screen, None if not shown
+        self.transition = Transition()  # fade between game, game over screen and menu
+        self.titleFont = pygame.font.SysFont("comicsans", 100)
+        self.selectFont = pygame.font.SysFont("comicsans", 75)
+        self.messageFont = pygame.font.SysFont("comicsans", 50)
+
+    def getMenuState(self):
+        """Everything that the menu drawn on screen depends on."""
+        return (pygame.mouse.get_pos(), pygame.mouse.get_pressed(), self.isControlsMenu, self.backdrop.isBuilt(),
+                self.gameOverEndTime is None)
 
     def start(self):
         self.keys = pygame.key.get_pressed()
         while not self.hasQuitted:
-            if not self.isControlsMenu:
+            if self.gameOverEndTime is not None and time.time() >= self.gameOverEndTime:
+                # game over screen has been shown long enough, fade back to menu
+                self.gameOverEndTime = None
+                self.transition.start(self.screen)
+            if not self.transition.isActive() and self.getMenuState() == self.drawnState:
+                # nothing has changed since menu was last drawn, so sleep until there is input instead of redrawing
+                if self.gameOverEndTime is None:
+                    waitForInput()
+                else:
+                    waitForInput(min(IDLE_TIMEOUT, self.gameOverEndTime - time.time()))
+                continue
+            frameStartTime = time.time()
+            if self.gameOverEndTime is None and not self.isControlsMenu:
                 self.updateMain()
+            elif self.gameOverEndTime is None:
+                self.updateControls()
+            if self.gameOverEndTime is not None:  # may have just finished playing game, so check again
+                self.renderGameOver()
+            elif not self.isControlsMenu:
                 self.renderMain()
             else:
-                self.updateControls()
                 self.renderControls()
+            self.transition.drawTo(self.screen)
             pygame.display.flip()
+            self.drawnState = self.getMenuState()
+            sessionTelemetry.observe("menu.frameTime", time.time() - frameStartTime)
+            if self.timeToFirstFrame is None:
+                self.timeToFirstFrame = time.time() - self.launchTime
+                sessionTelemetry.setGauge("menu.timeToFirstFrame", self.timeToFirstFrame)
+            if not self.backdrop.isBuilt():
+                self.backdrop.build()
             pygame.event.pump()
 
     def updateMain(self):
@@ -45,24 +131,30 @@ class MenuSession(object):
         elif self.wasLeftClkDown:
             self.wasLeftClkDown = False
             if self.selectedOption == PLAY:
+                if self.gameSession is None:
+                    from gamesession import GameSession
+                    self.gameSession = GameSession(self.screen)
+                    self.gameSession.recordDir = self.recordDir
+                    self.gameSession.world.viewRadius = self.viewRadius
+                    self.gameSession.pauseGC = self.pauseGC
                 self.gameSession.startGame()
                 pygame.mixer.stop()
-                self.gameOverScreen()
+                # fade from last frame of game to game over screen
+                self.gameOverEndTime = time.time() + GAME_OVER_DURATION
+                self.transition.start(self.screen)
             elif self.selectedOption == CONTROLS:
                 self.isControlsMenu = True
             elif self.selectedOption == QUIT:
                 self.hasQuitted = True
-        self.fakeSession.updateFake()
+        self.backdrop.update()
 
     def renderMain(self):
         w, h = self.screen.get_size()
-        self.fakeSession.renderFake()
-        titleFont = pygame.font.SysFont("comicsans", 100)
-        title = titleFont.render("iseeyou", 1, (255, 63, 63))
-        selectFont = pygame.font.SysFont("comicsans", 75)
-        play = selectFont.render("Play", 1, (255, 255, 255))
-        controls = selectFont.render("Controls", 1, (255, 255, 255))
-        quit = selectFont.render("Quit", 1, (255, 255, 255))
+        self.backdrop.render()
+        title = self.titleFont.render("iseeyou", 1, (255, 63, 63))
+        play = self.selectFont.render("Play", 1, (255, 255, 255))
+        controls = self.selectFont.render("Controls", 1, (255, 255, 255))
+        quit = self.selectFont.render("Quit", 1, (255, 255, 255))
         xT, yT = title.get_size()
         xC, yC = controls.get_size()
         xP, yP = play.get_size()
@@ -87,23 +179,18 @@ class MenuSession(object):
 
     def renderControls(self):
         w, h = self.screen.get_size()
-        self.fakeSession.renderFake()
-        titleFont = pygame.font.SysFont("comicsans", 100)
-        title = titleFont.render("Controls", 1, (255, 63, 63))
-        textFont = pygame.font.SysFont("comicsans", 75)
+        self.backdrop.render()
+        title = self.titleFont.render("Controls", 1, (255, 63, 63))
         lines = ["WASD - move", "Mouse - move flashlight", "Q - quit gameplay",
                  "ESC - pause game", "LCTRL - Sneak", "LSHIFT - Run", "(Click screen for main menu)"]
-        renderedLines = [textFont.render(line, 1, (255,255,255)) for line in lines]
+        renderedLines = [self.selectFont.render(line, 1, (255,255,255)) for line in lines]
         xT, yT = title.get_size()
         self.screen.blit(title, (w/2 - xT/2, h/2 - yT/2 - 350))
         for i, line in enumerate(renderedLines):
             self.screen.blit(line, (100, 200 + (80*i)))
 
-    def gameOverScreen(self):
-        for counter in range(400):
-            w, h = self.screen.get_size()
-            pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0,0,w,h))
-            textFont = pygame.font.SysFont("comicsans", 50)
-            line = textFont.render("igotyou", 1, (127, 0, 0))
-            self.screen.blit(line, (400, 600))
-            pygame.display.flip()
+    def renderGameOver(self):
+        w, h = self.screen.get_size()
+        pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0,0,w,h))
+        line = self.messageFont.render("igotyou", 1, (127, 0, 0))
+        self.screen.blit(line, (400, 600))
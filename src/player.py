@@ -1,43 +1,52 @@
-import pygame, os
+import pygame
 from world import World
+from audio import Emitter
 
 STANDING = 0
 RUNNING = 1
 WALKING = 2
 SNEAKING = 3
 
+FOOTSTEP_SOUND_FILES = {SNEAKING: "footstepsSneaking.wav", WALKING: "footstepsWalking.wav", RUNNING: "footstepsRunning.wav"}
+
 
 class Player(object):
+    __slots__ = ("xPos", "yPos", "lightAng", "dx", "dy", "speed", "state", "stamina", "footstepEmitters",
+                 "runSpeed", "walkSpeed", "sneakSpeed", "staminaDrain", "staminaRecharge", "walkHeardHalls", "sneakHeardFraction")
 
     def __init__(self, xPos, yPos):
         self.xPos = xPos
         self.yPos = yPos
-        self.footstepSounds = {SNEAKING: pygame.mixer.Sound(os.path.join("resources","sound","footstepsSneaking.wav")),
-                                WALKING: pygame.mixer.Sound(os.path.join("resources","sound","footstepsWalking.wav")),
-                                RUNNING: pygame.mixer.Sound(os.path.join("resources","sound","footstepsRunning.wav"))}
         self.lightAng = 0  # angle of light above rightwards vector, in radians
         self.dx = 0  # x and y components of own velocity
         self.dy = 0
         self.speed = 6  # general speed of player when moving (pixels per update)
         self.state = STANDING  # used by enemy to determine if player can be heard
         self.stamina = 1.0  # 1 if full stamina, 0 if depleted (used for running)
+        self.footstepEmitters = dict((state, Emitter(fileName)) for state, fileName in FOOTSTEP_SOUND_FILES.items())
+        self.runSpeed = 10
+        self.walkSpeed = 6
+        self.sneakSpeed = 2
+        self.staminaDrain = 0.01  # stamina used per update while running
+        self.staminaRecharge = 0.01  # stamina regained per update while not running
+        self.walkHeardHalls = 5  # how many hallway + intersect lengths away walking can be heard
+        self.sneakHeardFraction = 0.5  # how much of a hall width away sneaking can be heard
 
     def update(self, state, world):
         """Get speed of user in x and y based on keys pressed, detect collisions, and move player."""
         # reset speed values
         self.dx = 0; self.dy = 0
-        prevState = self.state  # state before potential state change
         # take user input
         if state[pygame.K_LSHIFT] and self.stamina>0:
             self.state = RUNNING
-            self.speed = 10
-            self.stamina -= 0.01
+            self.speed = self.runSpeed
+            self.stamina -= self.staminaDrain
         elif state[pygame.K_LCTRL]:
             self.state = SNEAKING
-            self.speed = 2
+            self.speed = self.sneakSpeed
         else:
             self.state = WALKING
-            self.speed = 6
+            self.speed = self.walkSpeed
         if state[pygame.K_w]: self.dy -= self.speed
         if state[pygame.K_a]: self.dx -= self.speed
         if state[pygame.K_s]: self.dy += self.speed
@@ -45,7 +54,7 @@ class Player(object):
         if self.dx==0 and self.dy==0:
             self.state = STANDING
         if self.state != RUNNING and not state[pygame.K_LSHIFT] and self.stamina < 1.0:
-            self.stamina += 0.01
+            self.stamina += self.staminaRecharge
         # check if will remain in world in 2 of same turn; if not, negate movement (collision detection)
         if not world.isInWorld(self.xPos + 2*self.dx, self.yPos): self.dx = 0
         if not world.isInWorld(self.xPos, self.yPos + 2*self.dy): self.dy = 0
@@ -54,19 +63,16 @@ class Player(object):
         # update position
         self.xPos += self.dx
         self.yPos += self.dy
-        # play sound of footsteps
-        if (self.dx!=0 or self.dy!=0) and prevState != self.state:  # is moving and state has changed, so update sound
-            if prevState != STANDING:
-                self.footstepSounds[prevState].stop()  # stop previous sound
-            self.footstepSounds[self.state].play(loops=-1)  # play on repeat indefinitely
-        elif (self.dx==0 and self.dy==0) and prevState != STANDING:
-            self.footstepSounds[prevState].stop()  # when player stops moving, stop footstep sound loop
+        # play sound of footsteps for current state, silence the rest
+        for state, emitter in self.footstepEmitters.items():
+            emitter.xPos = self.xPos; emitter.yPos = self.yPos
+            emitter.gain = 1.0 if (self.dx!=0 or self.dy!=0) and state == self.state else 0.0
 
     def getHeardRadius(self, world):
         """Return maximum distance enemy can currently be from player while still hearing player."""
         if self.state == STANDING:   return 0  # player cannot be heard if standing still
-        elif self.state == WALKING:  return 5*(world.hallWidth + world.hallLength)
-        elif self.state == SNEAKING: return world.hallWidth/2
+        elif self.state == WALKING:  return self.walkHeardHalls*(world.hallWidth + world.hallLength)
+        elif self.state == SNEAKING: return world.hallWidth*self.sneakHeardFraction
         elif self.state == RUNNING:  return 10**10  # if running, enemy will always hear player
 
     def drawTo(self, screen):
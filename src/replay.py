@@ -0,0 +1,115 @@
+"""
+Recording + replaying of the input given to a GameSession, so a played game can be reproduced exactly.
+
+Recording file format (little-endian):
+    header: "ISYR", version (uint8), random seed (uint32), screen width + height (uint16 each)
+    runs:   number of updates (uint16), pressed key bitmask (uint8), flashlight aim x + y (int16 each)
+Each run covers consecutive updates with identical input, so holding keys + keeping the mouse still costs nothing.
+
+Replay a recording from the repository root, eg.
+    python ./src/replay.py recording.rec --no-render
+"""
+import os, struct, time, argparse
+import pygame
+from inputstate import KeyState
+
+MAGIC = b"ISYR"
+VERSION = 1
+HEADER_FORMAT = "<4sBIHH"
+RUN_FORMAT = "<HBhh"
+MAX_RUN_LENGTH = 2**16 - 1
+
+# keys read by game during play, bit n of key bitmask is set if TRACKED_KEYS[n] is pressed
+TRACKED_KEYS = [pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d,
+                pygame.K_LSHIFT, pygame.K_LCTRL, pygame.K_ESCAPE, pygame.K_q]
+
+
+class InputRecorder(object):
+    """Writes input given to each update of a game session to a recording file."""
+
+    def __init__(self, path, seed, screenSize):
+        self.file = open(path, "wb")
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, seed, screenSize[0], screenSize[1]))
+        self.runInput = None  # (key bitmask, aim x, aim y) of current run
+        self.runLength = 0
+
+    def recordInput(self, keys, aimPos):
+        keyMask = 0
+        for bit, key in enumerate(TRACKED_KEYS):
+            if keys[key]: keyMask |= 1 << bit
+        updateInput = (keyMask, aimPos[0], aimPos[1])
+        if updateInput != self.runInput or self.runLength == MAX_RUN_LENGTH:
+            self.writeRun()
+            self.runInput = updateInput
+        self.runLength += 1
+
+    def writeRun(self):
+        if self.runLength > 0:
+            self.file.write(struct.pack(RUN_FORMAT, self.runLength, *self.runInput))
+        self.runLength = 0
+
+    def close(self):
+        self.writeRun()
+        self.file.close()
+
+
+class InputReplayer(object):
+    """Gives back input of each update from a recording file, then presses 'q' to quit once it runs out."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.seed, width, height = struct.unpack_from(HEADER_FORMAT, data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d recording" % (path, VERSION))
+        self.screenSize = (width, height)
+        self.runs = []  # list of [updates left, keys, aimPos]
+        for offset in range(struct.calcsize(HEADER_FORMAT), len(data), struct.calcsize(RUN_FORMAT)):
+            runLength, keyMask, xAim, yAim = struct.unpack_from(RUN_FORMAT, data, offset)
+            keys = KeyState([key for bit, key in enumerate(TRACKED_KEYS) if keyMask & (1 << bit)])
+            self.runs.append([runLength, keys, (xAim, yAim)])
+        self.quitInput = (KeyState([pygame.K_q]), self.runs[-1][2] if self.runs else (0, 0))  # keeps aim of last run
+        self.runs.reverse()  # so next run can be popped off end
+        self.updatesReplayed = 0
+
+    def nextInput(self):
+        """Return (keys, aimPos) for next update."""
+        if not self.runs:
+            return self.quitInput
+        run = self.runs[-1]
+        run[0] -= 1
+        if run[0] == 0:
+            self.runs.pop()
+        self.updatesReplayed += 1
+        return run[1], run[2]
+
+
+def main():
+    from gamesession import GameSession
+    parser = argparse.ArgumentParser(description="Replay a recorded game as fast as possible.")
+    parser.add_argument("recording")
+    parser.add_argument("--no-render", action="store_true", help="only update game, don't draw anything")
+    args = parser.parse_args()
+
+    if args.no_render:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    pygame.mixer.init()
+    replayer = InputReplayer(args.recording)
+    screen = pygame.display.set_mode(replayer.screenSize)
+    pygame.display.set_caption("iseeyou replay")
+    session = GameSession(screen)
+    session.replayer = replayer
+    session.renderEnabled = not args.no_render
+    startTime = time.time()
+    levels = session.startGame()
+    duration = time.time() - startTime
+    pygame.mixer.quit()
+    print("levels completed: %d" % levels)
+    print("%d updates in %.2fs (%.1f updates/s)" % (replayer.updatesReplayed, duration,
+                                                    replayer.updatesReplayed / max(duration, 1e-9)))
+
+
+if __name__ == "__main__":
+    main()
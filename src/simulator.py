@@ -0,0 +1,261 @@
+"""
+Balance simulator: plays many headless games w/ scripted players in a process pool and reports aggregate results.
+
+Run from the repository root, eg.
+    python ./src/simulator.py --games 10000 --bots random,sneak,run --set enemy.pathSpeed=6
+"""
+import os, math, random, time, json, ast, argparse, multiprocessing
+import pygame
+from inputstate import KeyState
+from gamesession import GameSession
+from enemy import Path, WANDERING, FOLLOWING, CLOSE, CHASING, RETURNING
+
+AI_STATE_NAMES = {WANDERING: "wandering", FOLLOWING: "following", CLOSE: "close", CHASING: "chasing", RETURNING: "returning"}
+
+# ways a simulated level can end
+DIED = 0
+EXITED = 1
+TIMED_OUT = 2
+
+# values reset by game every update, so overriding them would do nothing
+UNTUNABLE = {"enemy.speed": "enemy.pathSpeed, enemy.closeSpeed, enemy.returnSpeed or enemy.chaseSpeedFactor",
+             "player.speed": "player.runSpeed, player.walkSpeed or player.sneakSpeed"}
+
+SCREEN_SIZE = (800, 800)
+workerScreen = None  # surface headless sessions draw to, one per worker process
+
+
+class RandomWalkBot(object):
+    """Walks in a random direction, changing direction every so often."""
+
+    def __init__(self, rand):
+        self.rand = rand
+        self.direction = None
+        self.updatesLeft = 0  # updates before changing direction
+
+    def reset(self, session):
+        self.updatesLeft = 0
+
+    def getInput(self, session):
+        """Return (keys, aimPos) for next update."""
+        if self.updatesLeft <= 0:
+            self.direction = self.rand.choice([pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d])
+            self.updatesLeft = self.rand.randrange(30, 120)
+        self.updatesLeft -= 1
+        dx, dy = {pygame.K_w: (0, -1), pygame.K_a: (-1, 0), pygame.K_s: (0, 1), pygame.K_d: (1, 0)}[self.direction]
+        return KeyState([self.direction]), getAimPosTowards(dx, dy)
+
+
+class ExitBot(object):
+    """Follows shortest path of intersects to exit of level, pointing flashlight where it is going."""
+
+    def __init__(self, rand):
+        self.rand = rand
+        self.pathLs = []
+        self.distDownPath = 0
+        self.aimPos = getAimPosTowards(1, 0)
+
+    def reset(self, session):
+        path = Path(session.world)
+        path.setPathBetween(session.world.getClosestIntersectPoint(session.player), session.world.exitArea)
+        self.pathLs = path.getPathList()
+        self.distDownPath = 0
+
+    def getMoveKeys(self, player):
+        """Keys held down to change speed of player, eg. to sneak or run."""
+        return []
+
+    def getInput(self, session):
+        """Return (keys, aimPos) for next update."""
+        player = session.player
+        xl, yu, xr, yd = session.world.getIntersectBoundingBox(self.pathLs[self.distDownPath])
+        dx, dy = ((xl+xr)/2 - player.xPos, (yu+yd)/2 - player.yPos)
+        # close enough to intersect being approached, so go to next one
+        if abs(dx) <= player.runSpeed and abs(dy) <= player.runSpeed and self.distDownPath < len(self.pathLs)-1:
+            self.distDownPath += 1
+            xl, yu, xr, yd = session.world.getIntersectBoundingBox(self.pathLs[self.distDownPath])
+            dx, dy = ((xl+xr)/2 - player.xPos, (yu+yd)/2 - player.yPos)
+        keys = self.getMoveKeys(player)
+        if dx < -player.runSpeed: keys.append(pygame.K_a)
+        elif dx > player.runSpeed: keys.append(pygame.K_d)
+        if dy < -player.runSpeed: keys.append(pygame.K_w)
+        elif dy > player.runSpeed: keys.append(pygame.K_s)
+        if dx != 0 or dy != 0:
+            self.aimPos = getAimPosTowards(dx, dy)
+        return KeyState(keys), self.aimPos
+
+
+class SneakToExitBot(ExitBot):
+    """Sneaks the whole way to the exit."""
+
+    def getMoveKeys(self, player):
+        return [pygame.K_LCTRL]
+
+
+class RunToExitBot(ExitBot):
+    """Runs to the exit, walking while stamina recharges once it runs out."""
+
+    def __init__(self, rand):
+        ExitBot.__init__(self, rand)
+        self.isRecharging = False
+
+    def reset(self, session):
+        ExitBot.reset(self, session)
+        self.isRecharging = False
+
+    def getMoveKeys(self, player):
+        if player.stamina <= 0:
+            self.isRecharging = True
+        elif player.stamina >= 1.0:
+            self.isRecharging = False
+        return [] if self.isRecharging else [pygame.K_LSHIFT]
+
+
+BOTS = {"random": RandomWalkBot, "sneak": SneakToExitBot, "run": RunToExitBot}
+
+
+def getAimPosTowards(dx, dy):
+    """Get screen position to point flashlight at so it shines in direction (dx, dy) from player."""
+    mag = math.sqrt(dx**2 + dy**2)
+    w, h = SCREEN_SIZE
+    return (int(w/2 + 100*dx/mag), int(h/2 + 100*dy/mag))
+
+
+def applyTuning(session, tuning):
+    """Override values of player + enemy, given as {"enemy.pathSpeed": 6, ...}."""
+    for name, value in tuning.items():
+        objName, attr = name.split(".", 1)
+        obj = {"enemy": session.enemy, "player": session.player}[objName]
+        if name in UNTUNABLE:
+            raise ValueError("%s is set by the game every update, tune %s instead" % (name, UNTUNABLE[name]))
+        if not hasattr(obj, attr):
+            raise ValueError("unknown tuning value: %s" % name)
+        setattr(obj, attr, value)
+
+
+def initWorker():
+    """Set up pygame w/o a window or sound device in a worker process."""
+    global workerScreen
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    pygame.mixer.init()
+    workerScreen = pygame.Surface(SCREEN_SIZE)
+
+
+def runGame(task):
+    """Play one headless game until player dies, levels run out or a level takes too long. Return dict of results."""
+    seed, botName, tuning, maxLevels, maxUpdates = task
+    random.seed(seed)
+    bot = BOTS[botName](random.Random(seed))
+    session = GameSession(workerScreen)
+    result = {"bot": botName, "seed": seed, "levels": 0, "outcome": TIMED_OUT, "exitUpdates": [],
+              "aiStates": dict((name, 0) for name in AI_STATE_NAMES.values())}
+    for level in range(maxLevels):
+        session.newGame()
+        applyTuning(session, tuning)
+        bot.reset(session)
+        result["outcome"] = TIMED_OUT
+        for nUpdates in range(1, maxUpdates+1):
+            session.keys, session.flashlight.aimPos = bot.getInput(session)
+            session.update()
+            result["aiStates"][AI_STATE_NAMES[session.enemy.currentAI]] += 1
+            if session.hasBeenCaught():
+                result["outcome"] = DIED
+                break
+            elif session.world.hasReachedExit(session.player):
+                result["outcome"] = EXITED
+                result["exitUpdates"].append(nUpdates)
+                result["levels"] += 1
+                break
+        if result["outcome"] != EXITED:
+            break
+    pygame.mixer.stop()
+    return result
+
+
+def makeReport(results):
+    """Combine results of games played by the same bot into summary statistics."""
+    report = {}
+    for botName in sorted(set(r["bot"] for r in results)):
+        botResults = [r for r in results if r["bot"] == botName]
+        nGames = len(botResults)
+        levels = [r["levels"] for r in botResults]
+        exitUpdates = sorted(u for r in botResults for u in r["exitUpdates"])
+        aiStates = dict((name, sum(r["aiStates"][name] for r in botResults)) for name in AI_STATE_NAMES.values())
+        totalUpdates = max(1, sum(aiStates.values()))
+        report[botName] = {
+            "games": nGames,
+            "survivalRate": len([r for r in botResults if r["outcome"] != DIED]) / float(nGames),
+            "timeoutRate": len([r for r in botResults if r["outcome"] == TIMED_OUT]) / float(nGames),
+            "meanLevels": sum(levels) / float(nGames),
+            "maxLevels": max(levels),
+            "levelCounts": dict((str(n), levels.count(n)) for n in sorted(set(levels))),
+            "meanUpdatesToExit": sum(exitUpdates) / float(len(exitUpdates)) if exitUpdates else None,
+            "medianUpdatesToExit": exitUpdates[len(exitUpdates)/2] if exitUpdates else None,
+            "enemyStateFractions": dict((name, n / float(totalUpdates)) for name, n in aiStates.items()),
+        }
+    return report
+
+
+def printReport(report):
+    for botName, stats in sorted(report.items()):
+        print("%s (%d games)" % (botName, stats["games"]))
+        print("  survival rate:     %.3f (%.3f timed out)" % (stats["survivalRate"], stats["timeoutRate"]))
+        print("  levels reached:    mean %.2f, max %d" % (stats["meanLevels"], stats["maxLevels"]))
+        if stats["meanUpdatesToExit"] is not None:
+            print("  updates to exit:   mean %.0f, median %d" % (stats["meanUpdatesToExit"], stats["medianUpdatesToExit"]))
+        print("  enemy states:      " + ", ".join("%s %.3f" % (name, frac) for name, frac
+                                                  in sorted(stats["enemyStateFractions"].items())))
+
+
+def parseTuning(assignments):
+    """Turn list of "enemy.pathSpeed=6" strings into a dict of tuning values."""
+    tuning = {}
+    for assignment in assignments:
+        name, value = assignment.split("=", 1)
+        if name.split(".", 1)[0] not in ("enemy", "player") or "." not in name:
+            raise ValueError("tuning values must be enemy.<attr> or player.<attr>: %s" % name)
+        if name in UNTUNABLE:
+            raise ValueError("%s is set by the game every update, tune %s instead" % (name, UNTUNABLE[name]))
+        tuning[name] = ast.literal_eval(value)
+    return tuning
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless games to measure game balance.")
+    parser.add_argument("--games", type=int, default=1000, help="games to play per bot")
+    parser.add_argument("--bots", default="random,sneak,run", help="comma-separated bots: " + ", ".join(sorted(BOTS)))
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--max-levels", type=int, default=5, help="stop game after this many levels")
+    parser.add_argument("--max-updates", type=int, default=20000, help="give up on a level after this many updates")
+    parser.add_argument("--seed", type=int, default=0, help="seed of first game, following games use seed+1, seed+2...")
+    parser.add_argument("--set", action="append", default=[], metavar="OBJ.ATTR=VALUE",
+                        help="override tuning value, eg. enemy.pathSpeed=6 or player.staminaDrain=0.02")
+    parser.add_argument("--json", help="also write report to this file as JSON")
+    args = parser.parse_args()
+
+    botNames = args.bots.split(",")
+    for botName in botNames:
+        if botName not in BOTS:
+            parser.error("unknown bot: %s" % botName)
+    tuning = parseTuning(args.set)
+    tasks = [(args.seed + i, botName, tuning, args.max_levels, args.max_updates)
+             for botName in botNames for i in range(args.games)]
+
+    startTime = time.time()
+    pool = multiprocessing.Pool(args.processes, initializer=initWorker)
+    chunkSize = max(1, len(tasks) / (args.processes*16))
+    results = list(pool.imap_unordered(runGame, tasks, chunkSize))
+    pool.close()
+    pool.join()
+    report = makeReport(results)
+    printReport(report)
+    print("%d games in %.1fs on %d processes" % (len(tasks), time.time() - startTime, args.processes))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"tuning": tuning, "report": report}, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
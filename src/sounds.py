@@ -0,0 +1,10 @@
+import pygame, os
+
+loadedSounds = {}  # file name -> pygame Sound, so each sound file is only decoded once
+
+
+def getSound(fileName):
+    """Get sound from resources/sound, loading it the first time it is needed."""
+    if fileName not in loadedSounds:
+        loadedSounds[fileName] = pygame.mixer.Sound(os.path.join("resources", "sound", fileName))
+    return loadedSounds[fileName]
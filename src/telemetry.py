@@ -0,0 +1,197 @@
+"""
+Telemetry for long-running installs: frame times, memory use, GC pauses and time taken by world + path generation.
+Values are collected into histograms, which are written out as one JSON line every interval then reset.
+Output file is rotated to <path>.1 once it reaches maxBytes, so at most 2*maxBytes is kept on disk.
+GC pauses are timed w/ gc.callbacks where it exists (python 3.3+). Elsewhere automatic GC is turned off while
+telemetry is enabled, and telemetry runs + times collections itself once gc.get_count() passes gc.get_threshold().
+"""
+import os, gc, time, json
+
+# upper bounds of histogram buckets, in secs
+BUCKET_BOUNDS = [0.001, 0.002, 0.005, 0.01, 0.0167, 0.0333, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, float("inf")]
+
+
+class Histogram(object):
+    """Counts of observed values falling into each of BUCKET_BOUNDS, plus their sum + extremes."""
+
+    def __init__(self):
+        self.bucketCounts = [0]*len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.minValue = None
+        self.maxValue = None
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKET_BOUNDS):
+            if value <= bound:
+                self.bucketCounts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        if self.minValue is None or value < self.minValue: self.minValue = value
+        if self.maxValue is None or value > self.maxValue: self.maxValue = value
+
+    def toDict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(BUCKET_BOUNDS, self.bucketCounts):
+            cumulative += n
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        return {"count": self.count, "sum": self.total, "min": self.minValue, "max": self.maxValue, "buckets": buckets}
+
+
+class Telemetry(object):
+    """Collects histograms, counters + gauges, writing them to a file periodically once enabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.interval = 60.0  # secs between writes
+        self.maxBytes = 10*1024*1024  # size of file before it is rotated
+        self.histograms = {}  # name -> Histogram of values observed since last write
+        self.counters = {}  # name -> total since telemetry was enabled
+        self.gauges = {}  # name -> last value set
+        self.startTime = time.time()
+        self.lastWriteTime = self.startTime
+        self.gcStartTime = None
+        self.isCollectingGC = False  # if True, automatic GC is off + telemetry runs collections itself
+        self.isGCPaused = False  # if True, no collections are run until resumeGC()
+
+    def enable(self, path, interval=60.0, maxBytes=10*1024*1024):
+        self.enabled = True
+        self.path = path
+        self.interval = interval
+        self.maxBytes = maxBytes
+        self.startTime = self.lastWriteTime = time.time()
+        if hasattr(gc, "callbacks"):
+            gc.callbacks.append(self.onGC)
+        else:  # not available before python 3.3, so collections are run + timed by telemetry instead
+            self.isCollectingGC = True
+            gc.disable()
+
+    def close(self):
+        """Write out everything not yet written + stop collecting."""
+        if not self.enabled:
+            return
+        self.write()
+        self.enabled = False
+        if hasattr(gc, "callbacks") and self.onGC in gc.callbacks:
+            gc.callbacks.remove(self.onGC)
+        if self.isCollectingGC:
+            self.isCollectingGC = False
+            if not self.isGCPaused: gc.enable()
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        self.addToHistogram(name, value)
+        self.update()
+
+    def addToHistogram(self, name, value):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def update(self):
+        """Run any garbage collection due + write if interval has passed. Called w/ each observed value,
+        and should also be called periodically while idle so telemetry keeps being written w/o any frames."""
+        if not self.enabled:
+            return
+        if self.isCollectingGC and not self.isGCPaused:
+            self.collectGarbage()
+        if time.time() - self.lastWriteTime >= self.interval:
+            self.write()
+
+    def collectGarbage(self):
+        """Collect oldest generation whose count has passed its threshold, as automatic GC would, timing it."""
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        if thresholds[0] == 0:
+            return  # automatic GC turned off completely
+        for generation in (2, 1, 0):
+            if counts[generation] > thresholds[generation]:
+                startTime = time.time()
+                gc.collect(generation)
+                self.addToHistogram("gc.pause.gen%d" % generation, time.time() - startTime)
+                return
+
+    def pauseGC(self):
+        """Stop garbage collection, whether run automatically or by telemetry, until resumeGC()."""
+        self.isGCPaused = True
+        gc.disable()
+
+    def resumeGC(self):
+        self.isGCPaused = False
+        if not self.isCollectingGC:
+            gc.enable()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def setGauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def onGC(self, phase, info):
+        if phase == "start":
+            self.gcStartTime = time.time()
+        elif self.gcStartTime is not None:
+            self.addToHistogram("gc.pause.gen%d" % info["generation"], time.time() - self.gcStartTime)
+            self.gcStartTime = None
+
+    def sampleProcess(self):
+        """Set gauges for memory use + GC state of this process."""
+        rss = getResidentMemory()
+        if rss is not None:
+            self.gauges["process.residentBytes"] = rss
+        self.gauges["gc.pendingObjects"] = list(gc.get_count())
+        self.gauges["gc.trackedObjects"] = len(gc.get_objects())
+
+    def write(self):
+        """Append current values as a JSON line, then start new histograms."""
+        self.sampleProcess()
+        now = time.time()
+        line = json.dumps({"time": now, "uptime": now - self.startTime, "window": now - self.lastWriteTime,
+                           "histograms": dict((name, h.toDict()) for name, h in self.histograms.items()),
+                           "counters": self.counters, "gauges": self.gauges}, sort_keys=True) + "\n"
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.maxBytes:
+                if os.path.exists(self.path + ".1"):
+                    os.remove(self.path + ".1")
+                os.rename(self.path, self.path + ".1")
+            with open(self.path, "a") as f:
+                f.write(line)
+        except (IOError, OSError):
+            pass  # can't write file (e.g. bad path, disk full), drop line rather than stop game + try again next window
+        self.histograms = {}
+        self.lastWriteTime = now
+
+
+def getResidentMemory():
+    """Return bytes of memory currently used by this process, or None if not known on this platform."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+
+
+def timedFunction(name):
+    """Decorator observing how long each call to a function takes in sessionTelemetry."""
+    def decorate(func):
+        def timedFunc(*args, **kwargs):
+            if not sessionTelemetry.enabled:
+                return func(*args, **kwargs)
+            startTime = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sessionTelemetry.observe(name, time.time() - startTime)
+        timedFunc.__name__ = func.__name__
+        timedFunc.__doc__ = func.__doc__
+        return timedFunc
+    return decorate
+
+
+sessionTelemetry = Telemetry()  # shared by all sessions, does nothing until enabled
@@ -0,0 +1,34 @@
+import pygame, time
+
+TRANSITION_DURATION = 1.0  # default secs for a fade to take, whatever the frame rate
+
+
+class Transition(object):
+    """Fade from a captured frame to whatever is drawn after it.
+    Drawn on top of each new frame, so the game keeps updating + handling input underneath while it runs."""
+
+    def __init__(self, duration=TRANSITION_DURATION):
+        self.duration = duration
+        self.fromFrame = None  # copy of frame being faded away from, reused by every transition
+        self.startTime = None  # time current transition started, None if not transitioning
+
+    def start(self, screen):
+        """Start fading away from what is currently on screen."""
+        if self.fromFrame is None or self.fromFrame.get_size() != screen.get_size():
+            self.fromFrame = pygame.Surface(screen.get_size()).convert()
+        self.fromFrame.blit(screen, (0,0))
+        self.startTime = time.time()
+
+    def isActive(self):
+        return self.startTime is not None
+
+    def drawTo(self, screen):
+        """Draw frame being faded away from over the newly drawn frame on screen."""
+        if self.startTime is None:
+            return
+        progress = (time.time() - self.startTime) / self.duration
+        if progress >= 1:
+            self.startTime = None
+            return
+        self.fromFrame.set_alpha(int(255*(1-progress)))
+        screen.blit(self.fromFrame, (0,0))
@@ -3,6 +3,8 @@ import copy
 import random
 import math
 import time
+from telemetry import timedFunction
+from geometry import Segment, Box
 
 class World(object):
     """World object for horror game. A series of random sprawling hallways in all directions."""
@@ -22,12 +24,20 @@ class World(object):
         self.startX = 0; self.startY = 0
         self.floorColor = (127, 127, 127)
         self.exitArea = None  # hall intersect containing exit point
+        self.viewRadius = 0  # how many intersects away from closest one are drawn + lit, 0 for closest one + its hallways only
+        self.wallSegments = None  # all wall segments light can hit, made when first needed after world generated
+        self.cellSegments = None  # intersect -> indices in wallSegments of its walls + walls of its hallways
+        self.floorBoxes = None  # Boxes of all hallways + intersects, made when first needed after world generated
+        self.intersectBoxes = None  # Box of each intersect in intersectPnts
+        self.intersectPnts = None
 
     def resetWorld(self):
         self.grid = [[{ (x-1, y): False,
                         (x, y-1): False,
                         (x+1, y): False,
                         (x, y+1): False} for x in range(self.width)] for y in range(self.height)]
+        self.wallSegments = self.cellSegments = None
+        self.floorBoxes = self.intersectBoxes = self.intersectPnts = None
 
     def getSidePnts(self, x, y):
         """Get all intersect points adjacent to a point. Ignore points outside of grid boundaries."""
@@ -38,6 +48,7 @@ class World(object):
         if y < len(self.grid)-1:    sidePnts.append((x, y+1))
         return sidePnts
 
+    @timedFunction("world.genWorld")
     def genWorld(self, startX = 10, startY = 10):
         """Initializes grid of hallways in world. Starts at a point and expands out to random points adjacent to it."""
         assert(type(startX) is int)
@@ -70,6 +81,8 @@ class World(object):
         exitAreaPossibilities = [p for p in self.getPntList() if abs(p[0]-startX)>=3 and abs(p[1]-startY)>=3]
         self.exitArea = random.choice(self.getPntList() if len(exitAreaPossibilities)==0 \
                                       else exitAreaPossibilities)
+        self.wallSegments = self.cellSegments = None
+        self.floorBoxes = self.intersectBoxes = self.intersectPnts = None
 
     def getPntList(self):
         return [(x, y) for y, row in enumerate(self.grid) \
@@ -110,26 +123,96 @@ class World(object):
         yUp = p[1]*(self.hallWidth + self.hallLength) + self.hallWidth
         return (xLeft, yUp, xLeft+self.hallWidth, yUp+self.hallWidth)
 
+    def buildSegmentIndex(self):
+        """Work out wall segments of each intersect + its hallways, for lighting.
+        Walls of a hallway are shared by the intersects at both ends of it, so are only stored once."""
+        self.wallSegments = []
+        self.cellSegments = {}
+        hallSegments = {}  # hallway, as frozenset of its 2 ends -> indices of its walls
+        for x, y in self.getPntList():
+            xl, yu, xr, yd = self.getIntersectBoundingBox((x, y))
+            indices = []
+            for p, isConnected in self.grid[y][x].items():
+                if isConnected:
+                    hallway = frozenset([p, (x, y)])
+                    if hallway not in hallSegments:
+                        xl_h, yu_h, xr_h, yd_h = self.getHallBoundingBox(p, (x, y))
+                        if p[1] == y:  # if horizontal hall, walls = upper and lower sides
+                            walls = [Segment(xl_h, yu_h, xr_h, yu_h), Segment(xl_h, yd_h, xr_h, yd_h)]
+                        else:  # if vertical hall, walls = left and right sides
+                            walls = [Segment(xl_h, yu_h, xl_h, yd_h), Segment(xr_h, yu_h, xr_h, yd_h)]
+                        hallSegments[hallway] = range(len(self.wallSegments), len(self.wallSegments) + len(walls))
+                        self.wallSegments.extend(walls)
+                    indices.extend(hallSegments[hallway])
+                else:
+                    # wall of intersect itself bc. no hallway on that side
+                    if p[0] < x:   wall = Segment(xl, yu, xl, yd)  # hall to left missing
+                    elif p[0] > x: wall = Segment(xr, yu, xr, yd)  # hall to right missing
+                    elif p[1] < y: wall = Segment(xl, yu, xr, yu)  # hall above missing
+                    else:          wall = Segment(xl, yd, xr, yd)  # hall below missing
+                    indices.append(len(self.wallSegments))
+                    self.wallSegments.append(wall)
+            self.cellSegments[(x, y)] = indices
+
+    def getCellsNear(self, intersect, rect):
+        """Get intersects within viewRadius of intersect whose area or hallways may overlap rect (xMin, yMin, xMax, yMax).
+        Only intersects overlapping rect are looked at, so cost depends on what is on screen, not on viewRadius."""
+        if self.cellSegments is None:
+            self.buildSegmentIndex()
+        cellSize = self.hallWidth + self.hallLength
+        # intersect i + its hallways cover from i*cellSize + hallWidth - hallLength to i*cellSize + 2*hallWidth + hallLength
+        xLo = max(intersect[0] - self.viewRadius, int(math.ceil(float(rect[0] - 2*self.hallWidth - self.hallLength) / cellSize)))
+        xHi = min(intersect[0] + self.viewRadius, int(math.floor(float(rect[2] - self.hallWidth + self.hallLength) / cellSize)))
+        yLo = max(intersect[1] - self.viewRadius, int(math.ceil(float(rect[1] - 2*self.hallWidth - self.hallLength) / cellSize)))
+        yHi = min(intersect[1] + self.viewRadius, int(math.floor(float(rect[3] - self.hallWidth + self.hallLength) / cellSize)))
+        return [(x, y) for y in range(yLo, yHi+1) for x in range(xLo, xHi+1) if (x, y) in self.cellSegments]
+
+    def addWallSegmentsNear(self, intersect, rect, pool):
+        """Add wall segments around intersects within viewRadius of intersect that cross rect (xMin, yMin, xMax, yMax)
+        to SegmentPool pool, clipped to rect, each wall only once even if shared by several intersects."""
+        xMin, yMin, xMax, yMax = rect
+        indices = set()
+        for cell in self.getCellsNear(intersect, rect):
+            indices.update(self.cellSegments[cell])
+        for i in sorted(indices):
+            wall = self.wallSegments[i]
+            xA = wall.xA; yA = wall.yA; xB = wall.xB; yB = wall.yB
+            # walls are all horizontal or vertical, so bounding box overlapping rect = wall crosses rect,
+            # and clamping ends to rect = clipping wall to rect
+            if min(xA, xB) <= xMax and max(xA, xB) >= xMin and min(yA, yB) <= yMax and max(yA, yB) >= yMin:
+                pool.add(min(max(xA, xMin), xMax), min(max(yA, yMin), yMax),
+                         min(max(xB, xMin), xMax), min(max(yB, yMin), yMax))
+
+    def buildBoxes(self):
+        """Work out bounding boxes of hallways + intersects once, for collision detection + finding closest intersect."""
+        self.intersectPnts = self.getHallIntersectPoints()
+        self.intersectBoxes = [Box(*self.getIntersectBoundingBox(p)) for p in self.intersectPnts]
+        hallways = set(frozenset(hallway) for hallway in self.getHallways())  # each hallway is listed from both ends
+        self.floorBoxes = [Box(*self.getHallBoundingBox(*sorted(hallway))) for hallway in hallways] + self.intersectBoxes
+
     def isInWorld(self, x, y):
-        hallBoxes = [self.getHallBoundingBox(p0, p1) for p0, p1 in self.getHallways()]
-        isInHall = any([xMin <= x <= xMax and yMin <= y <= yMax for xMin,yMin,xMax,yMax in hallBoxes])
-        intBoxes = [self.getIntersectBoundingBox(p) for p in self.getHallIntersectPoints()]
-        isInInt = any([xMin <= x <= xMax and yMin <= y <= yMax for xMin,yMin,xMax,yMax in intBoxes])
-        return isInHall or isInInt
+        if self.floorBoxes is None:
+            self.buildBoxes()
+        for box in self.floorBoxes:
+            if box.xMin <= x <= box.xMax and box.yMin <= y <= box.yMax:
+                return True
+        return False
 
     def getStartPoint(self):
         x, y, _, _ = self.getIntersectBoundingBox((self.startX, self.startY))
         return (x+ (self.hallWidth/2), y + (self.hallWidth/2))
 
     def getClosestIntersectPoint(self, player):
-        intBoxes = [self.getIntersectBoundingBox(inter) for inter in self.getHallIntersectPoints()]
+        if self.intersectBoxes is None:
+            self.buildBoxes()
         xPlayer = player.xPos; yPlayer = player.yPos
-        getBoxDistToSelf = lambda box: math.sqrt(((box[0]+box[2])/2.0 - xPlayer)**2 + ((box[1]+box[3])/2.0 - yPlayer)**2)
-        closestBox = min(intBoxes, key=getBoxDistToSelf)
-        xl, yu, xr, yd = closestBox
-        xIntReal = int((xl - self.hallWidth) / (self.hallWidth + self.hallLength))
-        yIntReal = int((yu - self.hallWidth) / (self.hallWidth + self.hallLength))
-        return (xIntReal, yIntReal)
+        closestIndex = 0
+        closestDistSq = None  # squared dist, so no square root needed to compare
+        for i, box in enumerate(self.intersectBoxes):
+            distSq = (box.xCentre - xPlayer)**2 + (box.yCentre - yPlayer)**2
+            if closestDistSq is None or distSq < closestDistSq:
+                closestIndex = i; closestDistSq = distSq
+        return self.intersectPnts[closestIndex]
 
     def hasReachedExit(self, player):
         xl, yu, xr, yd = self.getIntersectBoundingBox(self.exitArea)
@@ -142,25 +225,21 @@ class World(object):
         w, h = self.screen.get_size()
         pygame.draw.rect(self.screen, (0,0,0), pygame.Rect(0, 0, w, h))  # black background
         intersect = self.getClosestIntersectPoint(player)
-        hallways = [(sidePnts, intersect) for sidePnts in self.getSidePnts(*intersect)]
-        for p0, p1 in hallways:
-            # starting x pnt of line = one intercept + many intercept-hallLength pairs + another intercept if line goes to right
-            xStart = self.hallWidth + p0[0]*(self.hallWidth + self.hallLength) + (self.hallWidth if p1[0]-p0[0]==1 else 0)
-            # starting y pnt of line = one intercept + many intercept-hallLength pairs + another intercept if line goes down
-            yStart = self.hallWidth + p0[1]*(self.hallWidth + self.hallLength) + (self.hallWidth if p1[1]-p0[1]==1 else 0)
-            xWidth = self.hallWidth if p1[0]-p0[0]==0 else self.hallLength*(p1[0]-p0[0])
-            yHeight = self.hallWidth if p1[1]-p0[1]==0 else self.hallLength*(p1[1]-p0[1])
-            rect = pygame.Rect(xStart-xCam, yStart-yCam, xWidth, yHeight)
-            pygame.draw.rect(self.screen, self.floorColor, rect)
-        # draw closest intersect
-        xLeft = intersect[0]*(self.hallWidth + self.hallLength) + self.hallWidth
-        yUp = intersect[1]*(self.hallWidth + self.hallLength) + self.hallWidth
-        rect = pygame.Rect(xLeft-xCam, yUp-yCam, self.hallWidth, self.hallWidth)
-        if intersect == self.exitArea:
-            pygame.draw.rect(self.screen, self.floorColor, rect)
-            rect2 = pygame.Rect(xLeft-xCam+50, yUp-yCam+50, self.hallWidth-(2*50), self.hallWidth-(2*50))
-            pygame.draw.rect(self.screen, (63, 63, 63), rect2)
-            rect3 = pygame.Rect(xLeft-xCam+100, yUp-yCam+100, self.hallWidth-(2*100), self.hallWidth-(2*100))
-            pygame.draw.rect(self.screen, (0, 0, 0), rect3)
-        else:
+        cells = self.getCellsNear(intersect, (xCam, yCam, xCam+w, yCam+h))
+        drawnHallways = set()
+        for x, y in cells:
+            for p, isConnected in self.grid[y][x].items():
+                hallway = frozenset([p, (x, y)])
+                if isConnected and hallway not in drawnHallways:  # hallways between 2 drawn intersects only drawn once
+                    xl, yu, xr, yd = self.getHallBoundingBox(p, (x, y))
+                    pygame.draw.rect(self.screen, self.floorColor, pygame.Rect(xl-xCam, yu-yCam, xr-xl, yd-yu))
+                    drawnHallways.add(hallway)
+        for cell in cells:
+            xLeft, yUp, _, _ = self.getIntersectBoundingBox(cell)
+            rect = pygame.Rect(xLeft-xCam, yUp-yCam, self.hallWidth, self.hallWidth)
             pygame.draw.rect(self.screen, self.floorColor, rect)
+            if cell == self.exitArea:
+                rect2 = pygame.Rect(xLeft-xCam+50, yUp-yCam+50, self.hallWidth-(2*50), self.hallWidth-(2*50))
+                pygame.draw.rect(self.screen, (63, 63, 63), rect2)
+                rect3 = pygame.Rect(xLeft-xCam+100, yUp-yCam+100, self.hallWidth-(2*100), self.hallWidth-(2*100))
+                pygame.draw.rect(self.screen, (0, 0, 0), rect3)